@@ -0,0 +1,134 @@
+import sys
+import json
+import logging
+import platform
+import argparse
+import subprocess
+import importlib.util
+from functools import partial
+from pathlib import Path
+from datetime import datetime, timezone
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+BASE_PATH = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_PATH))
+
+import main as pipeline
+from instrumentation import run_stage, format_stage_report, PROFILE_KEY
+from synthetic_data import generate_enrollment_csv
+
+DATA_FOLDER = Path(__file__).parent / 'data'
+HISTORY_PATH = Path(__file__).parent / 'history.json'
+BLOCKS_MAP_PATH = BASE_PATH / 'include' / 'disciplinas-bloco.csv'
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def benchmark_pipeline(input_path: Path, output_folder: Path, trace_memory: bool = False) -> list:
+    """Mede cada etapa de run_analysis_pipeline no modo em memoria."""
+    stages = []
+    measure = partial(run_stage, stages, trace_memory=trace_memory)
+    regular_path = output_folder / 'materias_regulares.csv'
+    irregular_path = output_folder / 'materias_irregulares.csv'
+
+    raw_df = measure('load_data_csv', pipeline.load_data_csv, input_path)
+    processed_df = measure('preprocess_data', pipeline.preprocess_data, raw_df)
+    class_metrics_df = measure('aggregate_class_metrics', pipeline.aggregate_class_metrics, processed_df)
+    output_rows_df = measure('drop_duplicate_rows', pipeline.drop_duplicate_rows, processed_df, raw_df.columns.tolist())
+    final_df = measure('enrich_rows', pipeline.enrich_rows, output_rows_df, class_metrics_df, BLOCKS_MAP_PATH)
+    regular_df, irregular_df = measure('separate_regular_and_irregular_classes',
+                                       pipeline.separate_regular_and_irregular_classes, final_df)
+
+    regular_cols, irregular_cols = pipeline.output_columns(raw_df.columns.tolist())
+    measure('prepare_and_save_csv (regulares)', pipeline.prepare_and_save_csv, regular_df, regular_cols, regular_path, False)
+    measure('prepare_and_save_csv (irregulares)', pipeline.prepare_and_save_csv, irregular_df, irregular_cols, irregular_path, False)
+    return stages
+
+def load_script(name: str, path: Path):
+    """Importa um script de graphs/ pelo caminho (graphs/main.py tem o mesmo nome do pipeline)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def benchmark_graphs(output_folder: Path, trace_memory: bool = False) -> list:
+    """Mede as analises de graficos apontando-as para os relatorios gerados no benchmark."""
+    graphs_main = load_script('graphs_main', BASE_PATH / 'graphs' / 'main.py')
+    graphs_analysis = load_script('graphs_analysis', BASE_PATH / 'graphs' / 'graphs_analysis.py')
+
+    stages = []
+    measure = partial(run_stage, stages, trace_memory=trace_memory)
+    graphs_main.INPUT_CSV_PATH = output_folder / 'materias_regulares.csv'
+    graphs_main.OUTPUT_PLOT_PATH = output_folder / 'grafico_correlacao.png'
+    graphs_analysis.INPUT_CSV_PATH = output_folder / 'materias_regulares.csv'
+    graphs_analysis.CLASS_TABLE_PATH = output_folder / 'turmas.csv'
+    graphs_analysis.RESULTS_FOLDER = output_folder
+
+    measure('run_correlation_analysis', graphs_main.run_correlation_analysis)
+    measure('run_comparative_analysis', graphs_analysis.run_comparative_analysis)
+
+    render_figures = load_script('render_figures', BASE_PATH / 'graphs' / 'render_figures.py')
+    measure('run_figure_rendering', render_figures.run_figure_rendering, output_folder / 'materias_regulares.csv',
+            output_folder / 'turmas.csv', output_folder)
+    return stages
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_PATH,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def append_history(history_path: Path, record: dict):
+    history = []
+    if history_path.exists():
+        with open(history_path, encoding='utf-8') as file:
+            history = json.load(file)
+    history.append(record)
+    with open(history_path, 'w', encoding='utf-8') as file:
+        json.dump(history, file, ensure_ascii=False, indent=2)
+
+def run_benchmarks(scales: list, seed: int, history_path: Path, skip_graphs: bool, trace_memory: bool = False):
+    DATA_FOLDER.mkdir(parents=True, exist_ok=True)
+
+    for rows in scales:
+        input_path = DATA_FOLDER / f'sintetico-{rows}-{seed}.csv'
+        if not input_path.exists():
+            generate_enrollment_csv(input_path, rows, seed)
+
+        output_folder = DATA_FOLDER / f'resultados-{rows}-{seed}'
+        output_folder.mkdir(exist_ok=True)
+
+        logging.info(f"Benchmark com {rows} registros...")
+        stages = benchmark_pipeline(input_path, output_folder, trace_memory)
+        if not skip_graphs:
+            stages += benchmark_graphs(output_folder, trace_memory)
+        logging.info("Medidas por etapa:\n" + format_stage_report(stages))
+
+        append_history(history_path, {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': current_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'rows': rows,
+            'seed': seed,
+            'total_wall_s': round(sum(stage['tempo_s'] for stage in stages), 4),
+            'stages': {stage['etapa']: {key: value for key, value in stage.items() if key not in ('etapa', PROFILE_KEY)}
+                       for stage in stages},
+        })
+    logging.info(f"Histórico atualizado em: {history_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo e a memória de cada etapa do pipeline com dados sintéticos.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SCALES, help="Escalas (número de registros).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', type=Path, default=HISTORY_PATH)
+    parser.add_argument('--skip-graphs', action='store_true', help="Não mede as análises de gráficos.")
+    parser.add_argument('--trace-memory', action='store_true', help="Mede o pico de memória alocada (tracemalloc), bem mais lento.")
+    args = parser.parse_args()
+
+    run_benchmarks(args.rows, args.seed, args.history, args.skip_graphs, args.trace_memory)
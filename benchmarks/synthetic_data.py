@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import logging
+import argparse
+
+BASE_PATH = Path(__file__).parent.parent
+BLOCKS_MAP_PATH = BASE_PATH / 'include' / 'disciplinas-bloco.csv'
+
+HEADER = ['Curso', 'Ano/Semestre Ingresso', 'RGA', 'Nome Aluno', 'Sexo', 'Data Nascimento',
+          'Ano/Semestre Disciplina', 'Disciplina', 'Dia da Semana', 'Horário Início', 'Horário Fim',
+          'Média Final', '% Frequência', 'Situação Final']
+
+COURSES = [
+    'ANÁLISE DE SISTEMAS - BACHARELADO',
+    'CIÊNCIA DA COMPUTAÇÃO - BACHARELADO',
+    'CURSO SUPERIOR DE TECNOLOGIA EM REDES DE COMPUTADORES',
+    'ENGENHARIA DE COMPUTAÇÃO - BACHARELADO',
+    'ENGENHARIA DE SOFTWARE - BACHARELADO',
+    'SISTEMAS DE INFORMAÇÃO - BACHARELADO',
+]
+WEEKDAYS = np.array(['Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado'])
+SEMESTERS = np.array([f"{year}/{term}" for year in range(2004, 2024) for term in (1, 2)])
+
+# (inicio, fim) por turno, com a frequencia aproximada observada em include/CSRC.csv
+START_TIMES = {
+    'MANHA': ([('07:00:00', '08:40:00'), ('07:30:00', '11:30:00'), ('09:00:00', '10:40:00'), ('08:00:00', '11:40:00')],
+              [0.45, 0.1, 0.35, 0.1]),
+    'TARDE': ([('13:00:00', '14:40:00'), ('13:30:00', '17:30:00'), ('15:00:00', '16:40:00')],
+              [0.55, 0.1, 0.35]),
+    'NOITE': ([('19:00:00', '20:40:00'), ('21:00:00', '22:40:00'), ('17:00:00', '18:40:00'), ('18:10:00', '19:50:00')],
+              [0.45, 0.45, 0.06, 0.04]),
+}
+SHIFT_PROBABILITIES = {'MANHA': 0.12, 'TARDE': 0.08, 'NOITE': 0.8}
+DAYS_PER_WEEK_PROBABILITIES = [0.3, 0.6, 0.1]
+
+EAD_CLASS_RATE = 0.02
+MIXED_SHIFT_CLASS_RATE = 0.06
+MALFORMED_TIME_RATE = 0.005
+COMMA_DECIMAL_RATE = 0.05
+UNMAPPED_DISCIPLINE_RATE = 0.1
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def load_discipline_names(blocks_map_path: Path) -> np.ndarray:
+    names = pd.read_csv(blocks_map_path, header=None, names=['Disciplina', 'bloco'])['Disciplina'].tolist()
+    unmapped = [f"TÓPICOS ESPECIAIS EM COMPUTAÇÃO {i}" for i in range(max(1, int(len(names) * UNMAPPED_DISCIPLINE_RATE)))]
+    return np.array(names + unmapped, dtype=object)
+
+def build_slot_pool() -> tuple[np.ndarray, np.ndarray, dict]:
+    """Lista plana de horarios (inicio, fim) e, para cada turno, os indices e probabilidades na lista."""
+    starts, ends, by_shift = [], [], {}
+    for shift, (slots, probabilities) in START_TIMES.items():
+        by_shift[shift] = (np.arange(len(starts), len(starts) + len(slots)), np.array(probabilities))
+        for start, end in slots:
+            starts.append(start)
+            ends.append(end)
+    return np.array(starts, dtype=object), np.array(ends, dtype=object), by_shift
+
+def generate_students(rng: np.random.Generator, n_students: int) -> pd.DataFrame:
+    entry_year = rng.integers(2003, 2023, n_students)
+    course = rng.integers(0, len(COURSES), n_students)
+    serial = rng.integers(0, 1000, n_students)
+    birth_year = entry_year - rng.integers(17, 35, n_students)
+    birth_day = rng.integers(1, 29, n_students)
+    birth_month = rng.integers(1, 13, n_students)
+    initials = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'), dtype=object)
+
+    return pd.DataFrame({
+        'Curso': np.array(COURSES, dtype=object)[course],
+        'Ano/Semestre Ingresso': pd.Series(entry_year).astype(str) + '/' + pd.Series(rng.integers(1, 3, n_students)).astype(str),
+        'RGA': pd.Series(entry_year).astype(str) + '19' + pd.Series(course).astype(str).str.zfill(2) + '**'
+               + pd.Series(serial).astype(str).str.zfill(3) + '-' + pd.Series(np.arange(n_students)).astype(str),
+        'Nome Aluno': initials[rng.integers(0, 26, n_students)] + '*** ' + initials[rng.integers(0, 26, n_students)] + '****',
+        'Sexo': np.where(rng.random(n_students) < 0.75, 'M', 'F'),
+        'Data Nascimento': pd.Series(birth_day).astype(str).str.zfill(2) + '/' + pd.Series(birth_month).astype(str).str.zfill(2)
+                           + '/' + pd.Series(birth_year).astype(str),
+    })
+
+def generate_classes_batch(rng: np.random.Generator, n_classes: int, disciplines: np.ndarray, slot_pool: tuple) -> dict:
+    """Turmas com 1 a 3 encontros semanais; os horarios de cada encontro sao sorteados por turno."""
+    _, _, by_shift = slot_pool
+    shift_names = list(SHIFT_PROBABILITIES)
+    shift_probabilities = np.array(list(SHIFT_PROBABILITIES.values()))
+
+    n_days = rng.choice([1, 2, 3], n_classes, p=DAYS_PER_WEEK_PROBABILITIES)
+    days = np.argsort(rng.random((n_classes, len(WEEKDAYS))), axis=1)[:, :3]
+
+    class_shift = rng.choice(len(shift_names), n_classes, p=shift_probabilities)
+    slot_shift = np.repeat(class_shift[:, None], 3, axis=1)
+    mixed = rng.random(n_classes) < MIXED_SHIFT_CLASS_RATE
+    slot_shift[mixed] = rng.choice(len(shift_names), (mixed.sum(), 3), p=shift_probabilities)
+
+    slots = np.empty((n_classes, 3), dtype=np.int64)
+    for code, shift in enumerate(shift_names):
+        indices, probabilities = by_shift[shift]
+        is_shift = slot_shift == code
+        slots[is_shift] = rng.choice(indices, is_shift.sum(), p=probabilities)
+
+    return {
+        'disciplina': disciplines[rng.integers(0, len(disciplines), n_classes)],
+        'semestre': SEMESTERS[rng.integers(0, len(SEMESTERS), n_classes)],
+        'n_days': n_days,
+        'days': days,
+        'slots': slots,
+        'ead': rng.random(n_classes) < EAD_CLASS_RATE,
+        'students': np.maximum(1, rng.poisson(rng.lognormal(3.0, 0.6, n_classes))),
+        'mean_grade': np.clip(rng.normal(6.0, 1.2, n_classes), 1.0, 9.5),
+    }
+
+def expand_batch(rng: np.random.Generator, classes: dict, students: pd.DataFrame, slot_pool: tuple) -> pd.DataFrame:
+    """Uma linha por aluno e por encontro semanal da turma, como no extrato original."""
+    slot_starts, slot_ends, _ = slot_pool
+
+    enrollment_class = np.repeat(np.arange(len(classes['students'])), classes['students'])
+    n_enrollments = len(enrollment_class)
+    student = rng.integers(0, len(students), n_enrollments)
+
+    frequency = np.clip(rng.normal(88, 15, n_enrollments), 0, 100).round(2)
+    grade = np.clip(rng.normal(classes['mean_grade'][enrollment_class], 2.0), 0, 10).round(1)
+    grade[frequency < 40] = 0.0
+    situation = np.where(frequency < 75, 'RF', np.where(grade >= 6.0, 'AP', 'RN'))
+
+    rows_per_enrollment = classes['n_days'][enrollment_class]
+    row_enrollment = np.repeat(np.arange(n_enrollments), rows_per_enrollment)
+    row_slot = np.arange(len(row_enrollment)) - np.repeat(np.cumsum(rows_per_enrollment) - rows_per_enrollment, rows_per_enrollment)
+    row_class = enrollment_class[row_enrollment]
+    n_rows = len(row_enrollment)
+
+    day = WEEKDAYS[classes['days'][row_class, row_slot]].astype(object)
+    start = slot_starts[classes['slots'][row_class, row_slot]]
+    end = slot_ends[classes['slots'][row_class, row_slot]]
+
+    ead = classes['ead'][row_class]
+    day[ead] = 'EAD'
+    malformed = ead | (rng.random(n_rows) < MALFORMED_TIME_RATE)
+    start = np.where(malformed, '0:00:00', start)
+    end = np.where(malformed, '0:00:00', end)
+
+    grade_text = pd.Series(grade[row_enrollment]).astype(str)
+    comma = rng.random(n_rows) < COMMA_DECIMAL_RATE
+    grade_text[comma] = grade_text[comma].str.replace('.', ',', regex=False)
+
+    rows = students.iloc[student[row_enrollment]].reset_index(drop=True)
+    rows['Ano/Semestre Disciplina'] = classes['semestre'][row_class]
+    rows['Disciplina'] = classes['disciplina'][row_class]
+    rows['Dia da Semana'] = day
+    rows['Horário Início'] = start
+    rows['Horário Fim'] = end
+    rows['Média Final'] = grade_text
+    rows['% Frequência'] = frequency[row_enrollment]
+    rows['Situação Final'] = situation[row_enrollment]
+    return rows[HEADER]
+
+def generate_enrollment_csv(output_path: Path, n_rows: int, seed: int = 0, blocks_map_path: Path = BLOCKS_MAP_PATH,
+                            classes_per_batch: int = 20000) -> Path:
+    """Gera um extrato sintetico com o mesmo esquema de include/CSRC.csv, com aproximadamente n_rows linhas."""
+    rng = np.random.default_rng(seed)
+    disciplines = load_discipline_names(blocks_map_path)
+    slot_pool = build_slot_pool()
+    students = generate_students(rng, max(100, n_rows // 12))
+
+    logging.info(f"Gerando {n_rows} registros sintéticos em '{output_path}'...")
+    written = 0
+    while written < n_rows:
+        batch = expand_batch(rng, generate_classes_batch(rng, classes_per_batch, disciplines, slot_pool), students, slot_pool)
+        batch = batch.iloc[:n_rows - written]
+        batch.to_csv(output_path, index=False, encoding='utf-8', mode='w' if written == 0 else 'a', header=written == 0)
+        written += len(batch)
+
+    logging.info(f"Extrato sintético salvo com {written} registros.")
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera extratos sintéticos de matrículas.")
+    parser.add_argument('rows', type=int, help="Número aproximado de registros.")
+    parser.add_argument('output', type=Path, help="Arquivo CSV de saída.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_enrollment_csv(args.output, args.rows, args.seed)
@@ -0,0 +1,262 @@
+import io
+import os
+import sys
+import json
+import logging
+import secrets
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+# pandas, matplotlib e seaborn sao importados dentro dos comandos que os usam, para que
+# '--help' e o cliente do servidor abram rapido e 'process' nao carregue bibliotecas de graficos.
+
+BASE_PATH = Path(__file__).parent
+GRAPHS_FOLDER = BASE_PATH / 'graphs'
+INCLUDE_FOLDER = BASE_PATH / 'include'
+RESULTS_FOLDER = BASE_PATH / 'results'
+DAEMON_FILE = RESULTS_FOLDER / '.servidor.json'
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def graphs_modules():
+    """Modulos de graficos (correlacao e comparacoes), importados so na primeira vez em que sao usados."""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    if str(GRAPHS_FOLDER) not in sys.path:
+        sys.path.append(str(GRAPHS_FOLDER))
+    import render_figures
+    return render_figures.correlation, render_figures.comparative
+
+def file_signature(*paths: Path) -> tuple:
+    return tuple((str(path), path.stat().st_mtime_ns) if path.exists() else (str(path), None) for path in paths)
+
+def cached(session: Dict[str, Any], key: tuple, paths: List[Path], loader: Callable):
+    """Valor guardado na sessao, recarregado quando algum dos arquivos de origem muda."""
+    signature = file_signature(*paths)
+    if key in session and session[key][0] == signature:
+        return session[key][1]
+    value = loader()
+    session[key] = (signature, value)
+    return value
+
+def report_paths(args) -> List[Path]:
+    return [args.report, args.report.with_suffix('.parquet'), args.class_table]
+
+def regular_report(session: Dict[str, Any], args):
+    correlation, _ = graphs_modules()
+    return cached(session, ('relatorio', str(args.report)), report_paths(args), lambda: correlation.load_analysis_data(args.report))
+
+def comparison_data(session: Dict[str, Any], args):
+    """Turmas regulares usadas nas comparacoes: a tabela por turma, se for a mais recente, ou o relatorio."""
+    def load():
+        _, comparative = graphs_modules()
+        classes_df = comparative.load_class_table_if_fresh(args.class_table, args.report)
+        return regular_report(session, args) if classes_df is None else classes_df
+    return cached(session, ('comparacao', str(args.report), str(args.class_table)), report_paths(args), load)
+
+def filtered_comparison_data(session: Dict[str, Any], args, min_students: float, max_weekly_classes: float):
+    _, comparative = graphs_modules()
+    return cached(session, ('filtrado', str(args.report), str(args.class_table), min_students, max_weekly_classes), report_paths(args),
+                  lambda: comparative.apply_filters_and_cleaning(comparison_data(session, args).copy(), min_students, max_weekly_classes))
+
+def correlation_statistics(session: Dict[str, Any], args):
+    correlation, _ = graphs_modules()
+    return cached(session, ('estatisticas', str(args.report)), report_paths(args),
+                  lambda: correlation.load_correlation_statistics(args.report, regular_report(session, args)))
+
+def olap_cube(session: Dict[str, Any], args):
+    """Cubo dos relatorios com os filtros dados; do cache em disco, se os relatorios nao mudaram."""
+    graphs_modules()
+    import olap_cube as cube_module
+    return cached(session, ('cubo', str(args.report), str(args.class_table), args.min_students, args.max_weekly_classes), report_paths(args),
+                  lambda: cube_module.load_cube(args.report, args.class_table, args.min_students, args.max_weekly_classes))
+
+def command_process(session: Dict[str, Any], args):
+    import main as pipeline
+    data = args.data or [INCLUDE_FOLDER / 'data.csv']
+    args.results.mkdir(parents=True, exist_ok=True)
+    pipeline.run_analysis_pipeline(
+        input_path=[str(path) for path in data] if len(data) > 1 else data[0],
+        regular_output_path=args.report,
+        irregular_output_path=args.results / 'materias_irregulares.csv',
+        blocks_map_path=args.blocks_map,
+        chunksize=args.chunksize,
+        columnar_output_path=args.report.with_suffix('.parquet'),
+        max_workers=args.workers,
+        unmapped_report_path=args.results / 'disciplinas_sem_bloco.csv',
+        catalog_path=args.results / 'catalogo.txt',
+        sleep_features_path=args.results / 'matriculas_sono.csv',
+        database_path=args.results / 'analise.sqlite',
+    )
+
+def command_correlate(session: Dict[str, Any], args):
+    correlation, _ = graphs_modules()
+    corr_matrix = correlation.correlation_from_statistics(correlation_statistics(session, args), args.min_students, args.max_weekly_classes)
+    if corr_matrix.isna().all().all():
+        logging.warning("Nenhum dado restou depois dos filtros. O gráfico de correlação nao sera gerado.")
+        return
+    args.results.mkdir(parents=True, exist_ok=True)
+    correlation.plot_correlation_matrix(corr_matrix, args.results / 'grafico_correlacao.png', correlation.PLOT_CONFIG)
+
+def command_compare(session: Dict[str, Any], args):
+    _, comparative = graphs_modules()
+    import olap_cube as cube_module
+    specs = comparative.comparison_plot_specs_from_aggregates(
+        cube_module.roll_up(olap_cube(session, args), ['Ano/Semestre Disciplina', 'turno_predominante']),
+        cube_module.roll_up(olap_cube(session, args), ['Ano/Semestre Disciplina', 'bloco']), args.results)
+    args.results.mkdir(parents=True, exist_ok=True)
+    for plot_spec in specs:
+        comparative.create_comparison_plot(**plot_spec)
+
+def command_rollup(session: Dict[str, Any], args):
+    graphs_modules()
+    import olap_cube as cube_module
+    rollup_df = cube_module.roll_up(olap_cube(session, args), args.group_by, cube_module.parse_filters(args.filter))
+    args.results.mkdir(parents=True, exist_ok=True)
+    report_path = cube_module.rollup_report_path(args.group_by, args.results)
+    rollup_df.to_csv(report_path, index=False, encoding='utf-8')
+    logging.info(f"Agregação salva em: {report_path}")
+
+def command_block_report(session: Dict[str, Any], args):
+    graphs_modules()
+    import block_reports
+    block_reports.write_block_reports(filtered_comparison_data(session, args, args.min_students, args.max_weekly_classes),
+                                      args.results, args.workers, args.force)
+
+def command_render(session: Dict[str, Any], args):
+    graphs_modules()
+    import render_figures
+    specs = render_figures.build_figure_specs(correlation_statistics(session, args),
+                                              filtered_comparison_data(session, args, float('-inf'), float('inf')).copy(), args.results)
+    args.results.mkdir(parents=True, exist_ok=True)
+    render_figures.render_figure_specs(specs, args.workers)
+
+def command_sweep(session: Dict[str, Any], args):
+    graphs_modules()
+    import threshold_sweep
+    threshold_sweep.sweep_thresholds(filtered_comparison_data(session, args, float('-inf'), float('inf')),
+                                     correlation_statistics(session, args), threshold_sweep.parse_thresholds(args.sweep_min_students),
+                                     threshold_sweep.parse_thresholds(args.sweep_max_weekly_classes), args.results, args.workers)
+
+COMMANDS = {
+    'process': command_process,
+    'correlate': command_correlate,
+    'compare': command_compare,
+    'block-report': command_block_report,
+    'render': command_render,
+    'sweep': command_sweep,
+    'rollup': command_rollup,
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Pipeline e análises em um só comando. Vários comandos em sequência compartilham os dados carregados, "
+                    "ex.: 'python cli.py process correlate compare'.")
+    parser.add_argument('commands', nargs='+', choices=list(COMMANDS) + ['serve', 'stop'], metavar='comando',
+                        help=f"{', '.join(COMMANDS)}; 'serve' inicia o servidor local e 'stop' o encerra.")
+    parser.add_argument('--data', type=Path, nargs='+', help="Extratos de matrículas para 'process' (padrão: include/data.csv).")
+    parser.add_argument('--blocks-map', type=Path, default=INCLUDE_FOLDER / 'disciplinas-bloco.csv')
+    parser.add_argument('--results', type=Path, default=RESULTS_FOLDER, help="Pasta dos relatórios e gráficos.")
+    parser.add_argument('--report', type=Path, default=None, help="Relatório de matérias regulares (padrão: <results>/materias_regulares.csv).")
+    parser.add_argument('--class-table', type=Path, default=None, help="Tabela por turma (padrão: <results>/turmas.csv).")
+    parser.add_argument('--chunksize', type=int, default=None, help="'process' em lotes de N registros.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos dos comandos paralelos.")
+    parser.add_argument('--min-students', type=int, default=5)
+    parser.add_argument('--max-weekly-classes', type=int, default=3)
+    parser.add_argument('--sweep-min-students', nargs='+', default=['5'], help="Valores de 'sweep' (inteiros ou 'inicio:fim[:passo]').")
+    parser.add_argument('--sweep-max-weekly-classes', nargs='+', default=['3'])
+    parser.add_argument('--group-by', nargs='+', default=['Ano/Semestre Disciplina', 'turno_predominante'],
+                        help="Dimensões de 'rollup': Ano/Semestre Disciplina, turno_predominante, bloco, Curso, carga_semanal_dias.")
+    parser.add_argument('--filter', nargs='*', default=[], help="Filtros de 'rollup' coluna=valor[,valor], ex.: bloco=FACOM.")
+    parser.add_argument('--force', action='store_true', help="'block-report' refaz todos os blocos.")
+    parser.add_argument('--daemon', action='store_true', help="Envia os comandos ao servidor local em vez de executá-los aqui.")
+    return parser
+
+def parse_args(argv: List[str]):
+    args = build_parser().parse_args(argv)
+    args.report = args.report or args.results / 'materias_regulares.csv'
+    args.class_table = args.class_table or args.results / 'turmas.csv'
+    return args
+
+def run_commands(session: Dict[str, Any], args) -> bool:
+    ok = True
+    for name in args.commands:
+        try:
+            COMMANDS[name](session, args)
+        except Exception as e:
+            logging.error(f"Erro no comando '{name}': {e}")
+            ok = False
+    return ok
+
+def serve(daemon_file: Path = DAEMON_FILE):
+    """Servidor local que mantem os dados carregados entre pedidos; cada pedido e uma lista de argumentos do CLI."""
+    authkey = secrets.token_bytes(32)
+    session: Dict[str, Any] = {}
+    with Listener(('127.0.0.1', 0), authkey=authkey) as listener:
+        daemon_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(os.open(daemon_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as file:
+            json.dump({'porta': listener.address[1], 'chave': authkey.hex(), 'pid': os.getpid()}, file)
+        logging.info(f"Servidor ouvindo em 127.0.0.1:{listener.address[1]}")
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, ConnectionError, OSError) as e:
+                    logging.warning(f"Conexão recusada: {e!r}")
+                    continue
+                with connection:
+                    try:
+                        if handle_request(session, connection):
+                            break
+                    except (EOFError, ConnectionError, OSError) as e:
+                        logging.warning(f"Conexão encerrada antes da resposta: {e!r}")
+        finally:
+            daemon_file.unlink(missing_ok=True)
+
+def handle_request(session: Dict[str, Any], connection) -> bool:
+    """Atende um pedido do servidor; retorna True se o pedido foi 'stop'."""
+    argv = connection.recv()
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.getLogger().addHandler(handler)
+    try:
+        try:
+            args = parse_args(argv)
+        except SystemExit:
+            logging.error(f"Argumentos inválidos: {argv}")
+            connection.send({'ok': False, 'log': output.getvalue()})
+            return False
+        if 'stop' in args.commands:
+            connection.send({'ok': True, 'log': "Servidor encerrado.\n"})
+            return True
+        ok = run_commands(session, args)
+    finally:
+        logging.getLogger().removeHandler(handler)
+    connection.send({'ok': ok, 'log': output.getvalue()})
+    return False
+
+def send_to_daemon(argv: List[str], daemon_file: Path = DAEMON_FILE) -> bool:
+    if not daemon_file.exists():
+        logging.error("Servidor não encontrado; inicie-o com 'python cli.py serve'.")
+        return False
+    with open(daemon_file, encoding='utf-8') as file:
+        daemon = json.load(file)
+    with Client(('127.0.0.1', daemon['porta']), authkey=bytes.fromhex(daemon['chave'])) as connection:
+        connection.send([arg for arg in argv if arg != '--daemon'])
+        response = connection.recv()
+    sys.stderr.write(response['log'])
+    return response['ok']
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if 'serve' in args.commands:
+        serve()
+        return 0
+    if args.daemon or 'stop' in args.commands:
+        return 0 if send_to_daemon(argv) else 1
+    return 0 if run_commands({}, args) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
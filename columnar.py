@@ -0,0 +1,48 @@
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# Chaves do artefato colunar (df.attrs, gravados nos metadados do Parquet)
+INPUT_HASH_KEY = 'input_hash'
+REPORT_HASH_KEY = 'report_hash'
+
+def hash_input_files(*paths: Path) -> str:
+    """Hash do conteudo dos arquivos, na ordem dada; um arquivo ausente entra pelo nome."""
+    digest = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            digest.update(f"ausente:{path.name}".encode('utf-8'))
+            continue
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def columnar_attrs(columnar_path: Path) -> dict:
+    """df.attrs gravados no Parquet, lidos so do esquema (sem carregar as colunas)."""
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(columnar_path).metadata or {}
+    return json.loads(metadata.get(b'PANDAS_ATTRS', b'{}'))
+
+def load_columnar_if_fresh(csv_path: Path) -> Optional[pd.DataFrame]:
+    """Carrega o artefato Parquet gravado junto do CSV, se ele foi gerado a partir deste mesmo CSV.
+
+    O pipeline grava no Parquet o hash do relatorio CSV escrito na mesma execucao; se o CSV mudou
+    (outra execucao, outro arquivo de entrada ou edicao manual), o artefato e ignorado.
+    """
+    columnar_path = csv_path.with_suffix('.parquet')
+    if not columnar_path.exists():
+        return None
+    try:
+        attrs = columnar_attrs(columnar_path)
+        if csv_path.exists() and attrs.get(REPORT_HASH_KEY) != hash_input_files(csv_path):
+            logging.info(f"Artefato colunar '{columnar_path}' não corresponde a '{csv_path}'; usando o CSV.")
+            return None
+        return pd.read_parquet(columnar_path)
+    except ImportError:
+        return None
@@ -0,0 +1,111 @@
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+GRAPHS_FOLDER = Path(__file__).parent
+BASE_PATH = GRAPHS_FOLDER.parent
+sys.path.append(str(GRAPHS_FOLDER))
+
+import graphs_analysis as comparative
+
+RESULTS_FOLDER = BASE_PATH / 'results'
+INPUT_CSV_PATH = RESULTS_FOLDER / 'materias_regulares.csv'
+CLASS_TABLE_PATH = RESULTS_FOLDER / 'turmas.csv'
+BLOCK_REPORTS_MANIFEST = '.blocos.json'
+# Mude ao alterar o formato do CSV ou do grafico de um bloco, para refazer todos
+BLOCK_REPORT_VERSION = 1
+
+def block_report_path(block: str, results_folder: Path) -> Path:
+    return results_folder / f"analise_bloco_{comparative.block_file_name(block)}_agregado.csv"
+
+def block_data_hash(block_data: pd.DataFrame, plot_spec: dict) -> str:
+    """Hash dos agregados do bloco e do que vai no grafico; se nao mudar, os arquivos do bloco nao mudam."""
+    digest = hashlib.sha256(str((BLOCK_REPORT_VERSION, plot_spec['title'], plot_spec['hue'])).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(block_data, index=False).to_numpy().tobytes())
+    digest.update(','.join(block_data.columns).encode('utf-8'))
+    return digest.hexdigest()
+
+def write_block_report(block_data: pd.DataFrame, report_path: Path, plot_spec: dict) -> Path:
+    block_data.to_csv(report_path, index=False, encoding='utf-8-sig')
+    comparative.create_comparison_plot(**plot_spec)
+    return report_path
+
+def load_block_manifest(manifest_path: Path) -> Dict[str, str]:
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def run_block_reports(input_csv_path: Path = INPUT_CSV_PATH, class_table_path: Path = CLASS_TABLE_PATH,
+                      results_folder: Path = RESULTS_FOLDER, max_workers: Optional[int] = None, force: bool = False):
+    """Gera o CSV agregado e o grafico por turno de todos os blocos, refazendo so os blocos cujos dados mudaram."""
+    try:
+        raw_df = comparative.load_class_table_if_fresh(class_table_path, input_csv_path)
+        if raw_df is None:
+            raw_df = comparative.load_data(input_csv_path)
+        else:
+            logging.info(f"Usando a tabela por turma: {class_table_path}")
+        base_filtered_df = comparative.apply_filters_and_cleaning(raw_df, comparative.MIN_STUDENTS_FILTER,
+                                                                 comparative.MAX_WEEKLY_CLASSES_FILTER)
+    except (FileNotFoundError, KeyError) as e:
+        logging.error(f"ERRO CRÍTICO: {e}")
+        return
+
+    write_block_reports(base_filtered_df, results_folder, max_workers, force)
+
+def write_block_reports(base_filtered_df: pd.DataFrame, results_folder: Path = RESULTS_FOLDER,
+                        max_workers: Optional[int] = None, force: bool = False):
+    """Grava os arquivos dos blocos cujos agregados mudaram desde a ultima execucao (ou de todos, com 'force')."""
+    results_folder.mkdir(parents=True, exist_ok=True)
+    manifest_path = results_folder / BLOCK_REPORTS_MANIFEST
+    manifest = {} if force else load_block_manifest(manifest_path)
+
+    pending = {}
+    for block, block_data in comparative.aggregate_by_block_and_shift(base_filtered_df).items():
+        plot_spec = comparative.block_shift_plot_spec(block, block_data, results_folder)
+        report_path = block_report_path(block, results_folder)
+        data_hash = block_data_hash(block_data, plot_spec)
+        if manifest.get(block) == data_hash and report_path.exists() and plot_spec['output_path'].exists():
+            continue
+        pending[block] = (block_data, report_path, plot_spec, data_hash)
+
+    n_blocks = base_filtered_df['bloco'].nunique()
+    logging.info(f"{len(pending)} de {n_blocks} blocos com dados novos; os demais foram mantidos.")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(write_block_report, block_data, report_path, plot_spec): block
+                   for block, (block_data, report_path, plot_spec, _) in pending.items()}
+        for future in as_completed(futures):
+            block = futures[future]
+            try:
+                future.result()
+                manifest[block] = pending[block][3]
+            except Exception as e:
+                logging.error(f"Erro ao gerar os arquivos do bloco '{block}': {e}")
+
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, sort_keys=True)
+    logging.info(f"Relatórios por bloco atualizados em: {results_folder}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o CSV agregado e o gráfico por turno de cada bloco.")
+    parser.add_argument('--input', type=Path, default=INPUT_CSV_PATH, help="Relatório de matérias regulares.")
+    parser.add_argument('--class-table', type=Path, default=CLASS_TABLE_PATH, help="Tabela por turma (usada se for mais recente).")
+    parser.add_argument('--output', type=Path, default=RESULTS_FOLDER, help="Pasta dos relatórios.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos disponíveis).")
+    parser.add_argument('--force', action='store_true', help="Refaz todos os blocos, mesmo sem mudanças.")
+    args = parser.parse_args()
+
+    run_block_reports(args.input, args.class_table, args.output, args.workers, args.force)
@@ -2,13 +2,18 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 from pathlib import Path
+import re
 import logging
+import sys
+from typing import Any, Dict, List, Optional
 
+sys.path.append(str(Path(__file__).parent.parent))
+from columnar import load_columnar_if_fresh
 
 BASE_PATH = Path().resolve()
 RESULTS_FOLDER = BASE_PATH / 'results'
-RESULTS_FOLDER.mkdir(exist_ok=True) 
 INPUT_CSV_PATH = RESULTS_FOLDER / 'materias_regulares.csv'
+CLASS_TABLE_PATH = RESULTS_FOLDER / 'turmas.csv'
 
 
 MIN_STUDENTS_FILTER = 5
@@ -17,9 +22,26 @@ BLOCK_NUN = "N/A"
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def is_fresh(path: Path, reference_path: Path) -> bool:
+    """True se 'path' existe e nao e mais antigo que 'reference_path' (ou se este nao existe)."""
+    if not path.exists():
+        return False
+    return not reference_path.exists() or path.stat().st_mtime >= reference_path.stat().st_mtime
+
+def load_class_table_if_fresh(class_table_path: Path, csv_path: Path) -> Optional[pd.DataFrame]:
+    """Carrega as turmas regulares da tabela por turma (uma linha por turma), se for a saida mais recente."""
+    if not is_fresh(class_table_path, csv_path):
+        return None
+    classes_df = pd.read_csv(class_table_path, encoding='utf-8')
+    return classes_df[classes_df['turma_regular']]
+
 def load_data(file_path: Path) -> pd.DataFrame:
-    """Carrega os dados do arquivo CSV."""
+    """Carrega os dados do artefato colunar, ou do arquivo CSV."""
     logging.info(f"Carregando dados de: {file_path}")
+    columnar_df = load_columnar_if_fresh(file_path)
+    if columnar_df is not None:
+        logging.info("Usando o artefato colunar (Parquet).")
+        return columnar_df
     if not file_path.exists():
         logging.error(f"Arquivo de entrada não encontrado: {file_path}")
         raise FileNotFoundError(f"Arquivo de entrada não encontrado: {file_path}.")
@@ -63,7 +85,7 @@ def aggregate_data(df: pd.DataFrame, group_by_cols: list) -> pd.DataFrame:
         logging.warning("Nenhum dado restante após a remoção de duplicatas para agregação.")
         return pd.DataFrame()
 
-    aggregated_df = unique_classes_df.groupby(group_by_cols)['media_disciplina'].agg(['mean', 'std']).reset_index()
+    aggregated_df = unique_classes_df.groupby(group_by_cols, observed=True)['media_disciplina'].agg(['mean', 'std']).reset_index()
     aggregated_df.rename(columns={'mean': 'media_das_medias', 'std': 'desvio_padrao_das_medias'}, inplace=True)
     aggregated_df['desvio_padrao_das_medias'] = aggregated_df['desvio_padrao_das_medias'].fillna(0)
     aggregated_df = aggregated_df.sort_values(by='Ano/Semestre Disciplina')
@@ -105,33 +127,61 @@ def create_comparison_plot(df: pd.DataFrame, output_path: Path, title: str, hue:
     plt.close(fig)
 
 
+def comparison_plot_specs(base_filtered_df: pd.DataFrame, results_folder: Path) -> List[Dict[str, Any]]:
+    """Argumentos de create_comparison_plot para os graficos por turno e por bloco (top 10)."""
+    turnos_data = aggregate_data(base_filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'turno_predominante'])
+    blocos_data = aggregate_data(base_filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'bloco'])
+    return comparison_plot_specs_from_aggregates(turnos_data, blocos_data, results_folder)
+
+def comparison_plot_specs_from_aggregates(turnos_data: pd.DataFrame, blocos_data: pd.DataFrame, results_folder: Path) -> List[Dict[str, Any]]:
+    """Os mesmos graficos a partir das medias ja agregadas por semestre e turno e por semestre e bloco."""
+    top_10_blocos = blocos_data['bloco'].value_counts().nlargest(10).index
+    blocos_data_filtrado = blocos_data[blocos_data['bloco'].isin(top_10_blocos)]
+
+    return [
+        dict(df=turnos_data, output_path=results_folder / 'comparacao_turnos_media_simples.png',
+             title="Média de Notas por Turno (Todos os Blocos - Filtros Aplicados)", hue='turno_predominante'),
+        dict(df=blocos_data_filtrado, output_path=results_folder / 'comparacao_blocos_media_simples.png',
+             title="Média de Notas por Bloco (Top 10 com Mais Registros - Filtros Aplicados)", hue='bloco'),
+    ]
+
+def block_file_name(block: str) -> str:
+    return re.sub(r'\W+', '_', block.lower()).strip('_')
+
+def aggregate_by_block_and_shift(base_filtered_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Media por semestre e turno de cada bloco, agregada uma vez e separada por bloco."""
+    return split_by_block(aggregate_data(base_filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'bloco', 'turno_predominante']))
+
+def split_by_block(block_shift_data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Separa as medias por semestre, bloco e turno em uma tabela por bloco."""
+    if block_shift_data.empty:
+        return {}
+
+    return {block: block_df.drop(columns='bloco').sort_values(['Ano/Semestre Disciplina', 'turno_predominante']).reset_index(drop=True)
+            for block, block_df in block_shift_data.groupby('bloco', sort=True)}
+
+def block_shift_plot_spec(block: str, block_data: pd.DataFrame, results_folder: Path) -> Dict[str, Any]:
+    return dict(df=block_data, output_path=results_folder / f"media_turno_bloco_{block_file_name(block)}.png",
+                title=f"Média de Notas por Turno - Bloco {block} (Filtros Aplicados)", hue='turno_predominante')
+
+def block_shift_plot_specs(base_filtered_df: pd.DataFrame, results_folder: Path) -> List[Dict[str, Any]]:
+    """Um grafico por bloco com a media de cada turno ao longo dos semestres (como media_turno_bloco_inma.png)."""
+    return [block_shift_plot_spec(block, block_data, results_folder)
+            for block, block_data in aggregate_by_block_and_shift(base_filtered_df).items()]
+
 def run_comparative_analysis():
     """Executa a análise completa, gerando os gráficos de comparação."""
     try:
-        raw_df = load_data(INPUT_CSV_PATH)
+        raw_df = load_class_table_if_fresh(CLASS_TABLE_PATH, INPUT_CSV_PATH)
+        if raw_df is None:
+            raw_df = load_data(INPUT_CSV_PATH)
+        else:
+            logging.info(f"Usando a tabela por turma: {CLASS_TABLE_PATH}")
         base_filtered_df = apply_filters_and_cleaning(raw_df, MIN_STUDENTS_FILTER, MAX_WEEKLY_CLASSES_FILTER)
 
-        turnos_data = aggregate_data(base_filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'turno_predominante'])
-        turnos_output_path = RESULTS_FOLDER / 'comparacao_turnos_media_simples.png'
-        create_comparison_plot(
-            df=turnos_data,
-            output_path=turnos_output_path,
-            title="Média de Notas por Turno (Todos os Blocos - Filtros Aplicados)",
-            hue='turno_predominante'
-        )
-
-        blocos_data = aggregate_data(base_filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'bloco'])
-        
-        top_10_blocos = blocos_data['bloco'].value_counts().nlargest(10).index
-        blocos_data_filtrado = blocos_data[blocos_data['bloco'].isin(top_10_blocos)]
-        
-        blocos_output_path = RESULTS_FOLDER / 'comparacao_blocos_media_simples.png'
-        create_comparison_plot(
-            df=blocos_data_filtrado,
-            output_path=blocos_output_path,
-            title="Média de Notas por Bloco (Top 10 com Mais Registros - Filtros Aplicados)",
-            hue='bloco'
-        )
+        RESULTS_FOLDER.mkdir(exist_ok=True)
+        for plot_spec in comparison_plot_specs(base_filtered_df, RESULTS_FOLDER):
+            create_comparison_plot(**plot_spec)
         
         logging.info("Análise comparativa completa executada com sucesso!")
 
@@ -5,10 +5,13 @@ from pathlib import Path
 from datetime import datetime
 import numpy as np
 import logging
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Optional
 
 BASE_PATH = Path(__file__).parent.parent
-print(BASE_PATH)
+sys.path.append(str(BASE_PATH))
+from columnar import load_columnar_if_fresh
+
 RESULTS_FOLDER = BASE_PATH / 'results'
 INPUT_CSV_PATH = RESULTS_FOLDER / 'materias_regulares.csv'
 OUTPUT_PLOT_PATH = RESULTS_FOLDER / 'grafico_correlacao.png'
@@ -48,6 +51,9 @@ PLOT_CONFIG = {
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_analysis_data(file_path: Path) -> pd.DataFrame:
+    columnar_df = load_columnar_if_fresh(file_path)
+    if columnar_df is not None:
+        return columnar_df
     if not file_path.exists():
         logging.error(f"Arquivo nao encontrado em: '{file_path}'...")
         raise FileNotFoundError(f"Arquivo nao encontrado em: '{file_path}'...")
@@ -68,15 +74,126 @@ def prepare_data_for_correlation(df: pd.DataFrame, num_cols: list, cat_cols: lis
         analysis_df[col] = pd.to_numeric(analysis_df[col], errors='coerce')
     
     analysis_df.dropna(inplace=True)
+    for col in cat_cols:
+        if isinstance(analysis_df[col].dtype, pd.CategoricalDtype):
+            analysis_df[col] = analysis_df[col].cat.remove_unused_categories()
     analysis_df = pd.get_dummies(analysis_df, columns=cat_cols, dtype=float)
     
     return analysis_df
 
-def generate_and_save_heatmap(df: pd.DataFrame, output_path: Path, config: Dict[str, Any]):
-    corr_matrix = df.corr()
+CORRELATION_STATS_VERSION = 2
+BUCKET_COLS = ['total_alunos_disciplina', 'carga_semanal_dias']
+
+def feature_order(features) -> List[str]:
+    """Ordem das colunas de prepare_data_for_correlation: numericas e depois os dummies de cada categorica, ordenados."""
+    features = set(features)
+    dummies = [sorted(f for f in features if f.startswith(f"{col}_")) for col in CATEGORICAL_COLS_TO_CONVERT]
+    return [col for col in NUMERIC_COLS_TO_CONVERT if col in features] + [f for group in dummies for f in group]
+
+def compute_correlation_statistics(df: pd.DataFrame) -> Dict[str, Any]:
+    """Estatisticas suficientes da correlacao por balde (total de alunos, dias por semana).
+
+    Para cada balde guarda o numero de linhas, a soma de cada variavel e a soma dos produtos de cada
+    par de variaveis; os filtros de analise selecionam baldes inteiros, entao a matriz de qualquer
+    combinacao de filtros sai dessas somas, sem voltar as linhas.
+    """
+    base_df = df[df['bloco'] != BLOCK_NUN].reset_index(drop=True)
+    analysis_df = prepare_data_for_correlation(base_df, NUMERIC_COLS_TO_CONVERT, CATEGORICAL_COLS_TO_CONVERT)
+    buckets = base_df.loc[analysis_df.index, BUCKET_COLS]
+    for col in BUCKET_COLS:
+        buckets[col] = pd.to_numeric(buckets[col], errors='coerce')
+    has_bucket = buckets.notna().all(axis=1).to_numpy()
+
+    features = feature_order(analysis_df.columns)
+    values = analysis_df[features].to_numpy(dtype=float)[has_bucket]
+    codes, bucket_keys = pd.MultiIndex.from_frame(buckets[has_bucket]).factorize()
+
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(bucket_keys)))
+    sorted_values = values[order]
+    cross = np.stack([block.T @ block for block in np.split(sorted_values, starts[1:])]) if len(bucket_keys) else np.zeros((0, len(features), len(features)))
+
+    return {
+        'features': features,
+        'buckets': bucket_keys.to_frame(index=False, name=BUCKET_COLS),
+        'count': np.bincount(codes, minlength=len(bucket_keys)).astype(float),
+        'sum': np.add.reduceat(sorted_values, starts, axis=0) if len(bucket_keys) else np.zeros((0, len(features))),
+        'cross': cross,
+    }
+
+def correlation_from_statistics(stats: Dict[str, Any], min_students: int, max_weekly_classes: int) -> pd.DataFrame:
+    """Matriz de correlacao de Pearson das linhas que passariam por filter_data, somando so os baldes selecionados."""
+    buckets = stats['buckets']
+    selected = ((buckets['total_alunos_disciplina'] >= min_students) & (buckets['carga_semanal_dias'] <= max_weekly_classes)).to_numpy()
+    n = stats['count'][selected].sum()
+    sums = stats['sum'][selected].sum(axis=0)
+    cross = stats['cross'][selected].sum(axis=0)
+
+    # Como em get_dummies, so entram os dummies de categorias presentes nas linhas filtradas
+    keep = np.array([feature in NUMERIC_COLS_TO_CONVERT for feature in stats['features']]) | (sums > 0)
+    features = [feature for feature, kept in zip(stats['features'], keep) if kept]
+    if n < 2:
+        return pd.DataFrame(np.nan, index=features, columns=features)
+
+    sums, cross = sums[keep], cross[np.ix_(keep, keep)]
+    covariance = (cross - np.outer(sums, sums) / n) / (n - 1)
+    variance = np.diag(covariance).copy()
+    variance[variance <= 1e-12 * np.maximum(np.diag(cross) / n, 1e-300)] = np.nan
+
+    std = np.sqrt(variance)
+    corr = np.clip(covariance / np.outer(std, std), -1, 1)
+    np.fill_diagonal(corr, np.where(np.isnan(std), np.nan, 1.0))
+    return pd.DataFrame(corr, index=features, columns=features)
+
+def correlation_statistics_cache_path(csv_path: Path) -> Path:
+    return csv_path.with_name(f".{csv_path.stem}.correlacao.npz")
+
+def source_signature(csv_path: Path) -> str:
+    """Versao das estatisticas e mtime/tamanho do CSV e do Parquet que load_analysis_data pode ler."""
+    parts = [str(CORRELATION_STATS_VERSION)]
+    for path in (csv_path, csv_path.with_suffix('.parquet')):
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return '|'.join(parts)
+
+def save_correlation_statistics(stats: Dict[str, Any], cache_path: Path, signature: str):
+    buckets = stats['buckets']
+    np.savez(cache_path, signature=np.array(signature), features=np.array(stats['features'], dtype=str),
+             bucket_values=buckets[BUCKET_COLS].to_numpy(dtype=float),
+             count=stats['count'], sum=stats['sum'], cross=stats['cross'])
+
+def load_cached_correlation_statistics(cache_path: Path, signature: str) -> Optional[Dict[str, Any]]:
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if str(cached['signature']) != signature:
+                return None
+            buckets = pd.DataFrame(cached['bucket_values'], columns=BUCKET_COLS)
+            return {'features': cached['features'].tolist(), 'buckets': buckets, 'count': cached['count'],
+                    'sum': cached['sum'], 'cross': cached['cross']}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def load_correlation_statistics(csv_path: Path, df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Estatisticas do relatorio, lidas do cache se o relatorio nao mudou; senao calculadas e salvas."""
+    cache_path = correlation_statistics_cache_path(csv_path)
+    signature = source_signature(csv_path)
+    stats = load_cached_correlation_statistics(cache_path, signature)
+    if stats is not None:
+        logging.info(f"Estatísticas de correlação lidas do cache: {cache_path}")
+        return stats
+
+    stats = compute_correlation_statistics(load_analysis_data(csv_path) if df is None else df)
+    try:
+        save_correlation_statistics(stats, cache_path, signature)
+    except OSError as e:
+        logging.warning(f"Não foi possível salvar as estatísticas de correlação em '{cache_path}': {e}")
+    return stats
+
+def plot_correlation_matrix(corr_matrix: pd.DataFrame, output_path: Path, config: Dict[str, Any]):
     mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
 
-    plt.figure(figsize=config['figsize'])
+    fig = plt.figure(figsize=config['figsize'])
     heatmap = sns.heatmap(corr_matrix, mask=mask, cmap=config['cmap'], annot=config['annot'], fmt=config['fmt'], linewidths=config['linewidths'])
     plt.title(config['title'], fontsize=config['fontsize'])
     heatmap.set_xticklabels(heatmap.get_xticklabels(), rotation=45, ha='right', fontsize=config['fontsize'])
@@ -84,19 +201,21 @@ def generate_and_save_heatmap(df: pd.DataFrame, output_path: Path, config: Dict[
 
     plt.savefig(output_path, dpi=config['dpi'])
     logging.info(f"Gráfico salvo com sucesso em: {output_path}")
+    plt.close(fig)
+
+def generate_and_save_heatmap(df: pd.DataFrame, output_path: Path, config: Dict[str, Any]):
+    plot_correlation_matrix(df.corr(), output_path, config)
 
 def run_correlation_analysis():
     try:
-        raw_df = load_analysis_data(INPUT_CSV_PATH)
-        filtered_df = filter_data(raw_df, MIN_STUDENTS_FILTER, MAX_WEEKLY_CLASSES_FILTER)
+        stats = load_correlation_statistics(INPUT_CSV_PATH)
+        corr_matrix = correlation_from_statistics(stats, MIN_STUDENTS_FILTER, MAX_WEEKLY_CLASSES_FILTER)
 
-        if filtered_df.empty:
+        if corr_matrix.empty or corr_matrix.isna().all().all():
             logging.warning("Nenhum dado restou depois dos filtros. O gráfico de correlação nao sera gerado.")
             return
-        
-        correlation_ready_df = prepare_data_for_correlation(filtered_df, NUMERIC_COLS_TO_CONVERT, CATEGORICAL_COLS_TO_CONVERT)
 
-        generate_and_save_heatmap(correlation_ready_df, OUTPUT_PLOT_PATH, PLOT_CONFIG)
+        plot_correlation_matrix(corr_matrix, OUTPUT_PLOT_PATH, PLOT_CONFIG)
     except FileNotFoundError as e:
         logging.error(str(e))
     except Exception as e:
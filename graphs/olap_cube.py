@@ -0,0 +1,229 @@
+import sys
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+GRAPHS_FOLDER = Path(__file__).parent
+BASE_PATH = GRAPHS_FOLDER.parent
+sys.path.append(str(GRAPHS_FOLDER))
+
+import graphs_analysis as comparative
+
+RESULTS_FOLDER = BASE_PATH / 'results'
+INPUT_CSV_PATH = RESULTS_FOLDER / 'materias_regulares.csv'
+CLASS_TABLE_PATH = RESULTS_FOLDER / 'turmas.csv'
+# Mude ao alterar o formato do cubo, para descartar os caches antigos
+CUBE_VERSION = 2
+SEMESTER_COL = 'Ano/Semestre Disciplina'
+COURSE_COL = 'Curso'
+CUBE_DIMENSIONS = [SEMESTER_COL, 'turno_predominante', 'bloco', COURSE_COL, 'carga_semanal_dias']
+UNIQUE_CLASS_COLS = [SEMESTER_COL, 'Disciplina', 'turno_predominante', 'bloco']
+CUBE_MEASURES = ['turmas', 'soma', 'soma_quadrados', 'soma_aprovacao', 'turmas_com_aprovacao']
+# 'turmas' conta cada turma uma vez (sem a dimensao do curso); 'cursos' conta a turma em cada curso com alunos nela
+CUBE_VIEWS = ['turmas', 'cursos']
+
+def build_cube_view(classes_df: pd.DataFrame, dimensions: List[str], labels: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Celulas (codigos das dimensoes) e medidas somaveis das turmas de 'classes_df'. Codigo -1 marca valor nulo."""
+    codes = [pd.Categorical(classes_df[dim], categories=labels[dim]).codes for dim in dimensions]
+    codes = np.column_stack(codes).astype(np.int32) if codes else np.zeros((len(classes_df), 0), dtype=np.int32)
+    cells, cell_of_class = np.unique(codes, axis=0, return_inverse=True)
+    cell_of_class = cell_of_class.ravel()
+
+    values = classes_df['media_disciplina'].to_numpy(dtype=float)
+    approval = pd.to_numeric(classes_df.get('taxa_aprovacao', pd.Series(np.nan, index=classes_df.index)),
+                             errors='coerce').to_numpy(dtype=float)
+    has_approval = ~np.isnan(approval)
+    measures = {
+        'turmas': np.bincount(cell_of_class, minlength=len(cells)),
+        'soma': np.bincount(cell_of_class, weights=values, minlength=len(cells)),
+        'soma_quadrados': np.bincount(cell_of_class, weights=values ** 2, minlength=len(cells)),
+        'soma_aprovacao': np.bincount(cell_of_class, weights=np.where(has_approval, approval, 0.0), minlength=len(cells)),
+        'turmas_com_aprovacao': np.bincount(cell_of_class, weights=has_approval, minlength=len(cells)),
+    }
+    return {'dimensions': dimensions, 'cells': cells, 'measures': measures}
+
+def build_cube(base_filtered_df: pd.DataFrame, min_students: int, max_weekly_classes: int) -> Dict[str, Any]:
+    """Agregados somaveis de media_disciplina e taxa_aprovacao em cada combinacao das dimensoes.
+
+    As turmas sao as mesmas de aggregate_data (a primeira de cada semestre, disciplina, turno e bloco), entao
+    qualquer agrupamento somado pelo roll_up da o mesmo resultado. Uma turma pode ter alunos de varios cursos:
+    por isso o curso fica em uma segunda visao, montada antes de descartar as linhas repetidas, com a primeira
+    turma de cada chave em cada curso (o mesmo que aggregate_data sobre as linhas de um curso). 'Curso' fica
+    de fora quando a entrada e a tabela por turma, que nao tem essa coluna.
+    """
+    dimensions = [dim for dim in CUBE_DIMENSIONS if dim in base_filtered_df.columns]
+    labels = {}
+    for dim in dimensions:
+        uniques = np.asarray(pd.factorize(base_filtered_df[dim], sort=True)[1])
+        labels[dim] = uniques if np.issubdtype(uniques.dtype, np.number) else uniques.astype(str)
+
+    unique_classes_df = base_filtered_df.drop_duplicates(subset=UNIQUE_CLASS_COLS)
+    views = {'turmas': build_cube_view(unique_classes_df, [dim for dim in dimensions if dim != COURSE_COL], labels)}
+    if COURSE_COL in dimensions:
+        course_classes_df = base_filtered_df.drop_duplicates(subset=UNIQUE_CLASS_COLS + [COURSE_COL])
+        views['cursos'] = build_cube_view(course_classes_df, dimensions, labels)
+
+    logging.info(f"Cubo com {len(views['turmas']['cells'])} células montado a partir de {len(unique_classes_df)} turmas.")
+    return {'dimensions': dimensions, 'labels': labels, 'views': views, 'filters': (min_students, max_weekly_classes)}
+
+def roll_up(cube: Dict[str, Any], group_by_cols: List[str], filters: Optional[Dict[str, list]] = None) -> pd.DataFrame:
+    """Media e desvio padrao de media_disciplina por grupo, somando as celulas do cubo (sem reler turmas).
+
+    Retorna as colunas de aggregate_data, na mesma ordem, mais o numero de turmas e a media das taxas de
+    aprovacao. 'filters' restringe dimensoes a listas de valores, ex.: {'turno_predominante': ['NOITE']}.
+    Agrupando ou filtrando por curso, cada turma entra em todos os cursos que tem alunos nela.
+    """
+    filters = filters or {}
+    missing = [col for col in [*group_by_cols, *filters] if col not in cube['dimensions']]
+    if missing:
+        raise KeyError(f"Dimensões fora do cubo: {missing}. Disponíveis: {cube['dimensions']}")
+
+    by_course = COURSE_COL in group_by_cols or COURSE_COL in filters
+    view = cube['views']['cursos' if by_course else 'turmas']
+    dimensions, cells = view['dimensions'], view['cells']
+    keep = np.ones(len(cells), dtype=bool)
+    for dim, values in filters.items():
+        allowed = np.flatnonzero(np.isin(cube['labels'][dim], values))
+        keep &= np.isin(cells[:, dimensions.index(dim)], allowed)
+    group_codes = cells[keep][:, [dimensions.index(col) for col in group_by_cols]]
+    # Como o groupby, grupos com valor nulo ficam de fora
+    has_group = (group_codes >= 0).all(axis=1)
+    groups, cell_group = np.unique(group_codes[has_group], axis=0, return_inverse=True)
+    cell_group = cell_group.ravel()
+
+    sums = {name: np.bincount(cell_group, weights=measure[keep][has_group], minlength=len(groups))
+            for name, measure in view['measures'].items()}
+    n = sums['turmas']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums['soma'] / n
+        m2 = np.maximum(sums['soma_quadrados'] - sums['soma'] * mean, 0.0)
+        aggregated_df = pd.DataFrame({col: cube['labels'][col][groups[:, i]] for i, col in enumerate(group_by_cols)})
+        aggregated_df['media_das_medias'] = mean
+        aggregated_df['desvio_padrao_das_medias'] = np.where(n > 1, np.sqrt(m2 / (n - 1)), 0.0)
+        aggregated_df['turmas'] = n.astype(np.int64)
+        aggregated_df['taxa_aprovacao_media'] = sums['soma_aprovacao'] / sums['turmas_com_aprovacao']
+
+    if SEMESTER_COL in group_by_cols:
+        aggregated_df = aggregated_df.sort_values(by=SEMESTER_COL)
+    return aggregated_df
+
+def comparison_plot_specs(cube: Dict[str, Any], results_folder: Path) -> List[Dict[str, Any]]:
+    """Graficos de comparacao por turno e por bloco e os de turnos de cada bloco, tirados do cubo."""
+    specs = comparative.comparison_plot_specs_from_aggregates(roll_up(cube, [SEMESTER_COL, 'turno_predominante']),
+                                                              roll_up(cube, [SEMESTER_COL, 'bloco']), results_folder)
+    block_shift_data = roll_up(cube, [SEMESTER_COL, 'bloco', 'turno_predominante'])
+    return specs + [comparative.block_shift_plot_spec(block, block_data, results_folder)
+                    for block, block_data in comparative.split_by_block(block_shift_data).items()]
+
+def cube_cache_path(input_csv_path: Path) -> Path:
+    return input_csv_path.with_name(f".{input_csv_path.stem}.cubo.npz")
+
+def cube_signature(input_csv_path: Path, class_table_path: Path, min_students: int, max_weekly_classes: int) -> str:
+    """Versao, filtros e mtime/tamanho dos arquivos de onde as turmas podem ser lidas."""
+    parts = [str(CUBE_VERSION), f"{min_students}:{max_weekly_classes}"]
+    for path in (input_csv_path, input_csv_path.with_suffix('.parquet'), class_table_path):
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return '|'.join(parts)
+
+def save_cube(cube: Dict[str, Any], cache_path: Path, signature: str):
+    labels = {f"rotulos_{i}": cube['labels'][dim] for i, dim in enumerate(cube['dimensions'])}
+    views = {}
+    for view_name, view in cube['views'].items():
+        views[f"{view_name}_dimensoes"] = np.array(view['dimensions'], dtype=str)
+        views[f"{view_name}_celulas"] = view['cells']
+        views.update({f"{view_name}_medida_{name}": values for name, values in view['measures'].items()})
+    np.savez(cache_path, signature=np.array(signature), dimensions=np.array(cube['dimensions'], dtype=str),
+             filters=np.array(cube['filters'], dtype=float), **labels, **views)
+
+def load_cached_cube(cache_path: Path, signature: str) -> Optional[Dict[str, Any]]:
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if str(cached['signature']) != signature:
+                return None
+            dimensions = cached['dimensions'].tolist()
+            views = {view_name: {'dimensions': cached[f"{view_name}_dimensoes"].tolist(),
+                                 'cells': cached[f"{view_name}_celulas"],
+                                 'measures': {name: cached[f"{view_name}_medida_{name}"] for name in CUBE_MEASURES}}
+                     for view_name in CUBE_VIEWS if f"{view_name}_celulas" in cached.files}
+            return {'dimensions': dimensions,
+                    'labels': {dim: cached[f"rotulos_{i}"] for i, dim in enumerate(dimensions)},
+                    'views': views,
+                    'filters': tuple(cached['filters'].tolist())}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def load_base_data(input_csv_path: Path, class_table_path: Path, min_students: int, max_weekly_classes: int) -> pd.DataFrame:
+    raw_df = comparative.load_class_table_if_fresh(class_table_path, input_csv_path)
+    if raw_df is None:
+        raw_df = comparative.load_data(input_csv_path)
+    else:
+        logging.info(f"Usando a tabela por turma: {class_table_path}")
+    return comparative.apply_filters_and_cleaning(raw_df, min_students, max_weekly_classes)
+
+def load_cube(input_csv_path: Path = INPUT_CSV_PATH, class_table_path: Path = CLASS_TABLE_PATH,
+              min_students: int = comparative.MIN_STUDENTS_FILTER, max_weekly_classes: int = comparative.MAX_WEEKLY_CLASSES_FILTER,
+              base_filtered_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Cubo dos relatorios, lido do cache se eles e os filtros nao mudaram; senao montado e salvo."""
+    cache_path = cube_cache_path(input_csv_path)
+    signature = cube_signature(input_csv_path, class_table_path, min_students, max_weekly_classes)
+    cube = load_cached_cube(cache_path, signature)
+    if cube is not None:
+        logging.info(f"Cubo lido do cache: {cache_path}")
+        return cube
+
+    if base_filtered_df is None:
+        base_filtered_df = load_base_data(input_csv_path, class_table_path, min_students, max_weekly_classes)
+    cube = build_cube(base_filtered_df, min_students, max_weekly_classes)
+    try:
+        save_cube(cube, cache_path, signature)
+    except OSError as e:
+        logging.warning(f"Não foi possível salvar o cubo em '{cache_path}': {e}")
+    return cube
+
+def parse_filters(values: List[str]) -> Dict[str, list]:
+    """'coluna=valor1,valor2' -> {coluna: [valor1, valor2]}; valores numericos viram float."""
+    filters = {}
+    for value in values:
+        col, separator, expected = value.partition('=')
+        if not separator:
+            raise ValueError(f"Filtro inválido '{value}': use coluna=valor.")
+        filters[col] = [float(item) if col == 'carga_semanal_dias' else item for item in expected.split(',')]
+    return filters
+
+def rollup_report_path(group_by_cols: List[str], results_folder: Path) -> Path:
+    return results_folder / f"cubo_{'_'.join(comparative.block_file_name(col) for col in group_by_cols)}.csv"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregações por qualquer combinação de semestre, turno, bloco, curso e dias por semana.")
+    parser.add_argument('--group-by', nargs='+', default=[SEMESTER_COL, 'turno_predominante'], help=f"Dimensões: {', '.join(CUBE_DIMENSIONS)}.")
+    parser.add_argument('--filter', nargs='*', default=[], help="Filtros coluna=valor[,valor], ex.: turno_predominante=NOITE bloco=FACOM.")
+    parser.add_argument('--plots', action='store_true', help="Gera os gráficos de comparação a partir do cubo.")
+    parser.add_argument('--input', type=Path, default=INPUT_CSV_PATH, help="Relatório de matérias regulares.")
+    parser.add_argument('--class-table', type=Path, default=CLASS_TABLE_PATH, help="Tabela por turma (usada se for mais recente).")
+    parser.add_argument('--output', type=Path, default=RESULTS_FOLDER, help="Pasta dos resultados.")
+    parser.add_argument('--min-students', type=int, default=comparative.MIN_STUDENTS_FILTER)
+    parser.add_argument('--max-weekly-classes', type=int, default=comparative.MAX_WEEKLY_CLASSES_FILTER)
+    args = parser.parse_args()
+
+    try:
+        cube = load_cube(args.input, args.class_table, args.min_students, args.max_weekly_classes)
+        rollup_df = roll_up(cube, args.group_by, parse_filters(args.filter))
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        logging.error(f"ERRO CRÍTICO: {e}")
+        sys.exit(1)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    report_path = rollup_report_path(args.group_by, args.output)
+    rollup_df.to_csv(report_path, index=False, encoding='utf-8')
+    logging.info(f"Agregação salva em: {report_path}")
+    if args.plots:
+        for plot_spec in comparison_plot_specs(cube, args.output):
+            comparative.create_comparison_plot(**plot_spec)
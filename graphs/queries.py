@@ -0,0 +1,148 @@
+import time
+import sqlite3
+import logging
+import argparse
+from pathlib import Path
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+GRAPHS_FOLDER = Path(__file__).parent
+BASE_PATH = GRAPHS_FOLDER.parent
+RESULTS_FOLDER = BASE_PATH / 'results'
+DATABASE_PATH = RESULTS_FOLDER / 'analise.sqlite'
+
+# Os mesmos valores de graphs_analysis.py, repetidos para que as consultas nao importem seaborn e matplotlib
+MIN_STUDENTS_FILTER = 5
+MAX_WEEKLY_CLASSES_FILTER = 3
+BLOCK_NUN = "N/A"
+SEMESTER_COL = 'Ano/Semestre Disciplina'
+UNIQUE_CLASS_COLS = [SEMESTER_COL, 'Disciplina', 'turno_predominante', 'bloco']
+REQUIRED_COLS = ['media_disciplina', 'total_alunos_disciplina', 'carga_semanal_dias', 'bloco', 'turno_predominante']
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def connect(database_path: Path = DATABASE_PATH) -> sqlite3.Connection:
+    """Abre o banco gerado por run_analysis_pipeline(..., database_path=...) somente para leitura."""
+    database_path = Path(database_path)
+    if not database_path.exists():
+        raise FileNotFoundError(f"Banco de dados não encontrado: {database_path}. Rode o pipeline com 'database_path'.")
+    return sqlite3.connect(f"{database_path.resolve().as_uri()}?mode=ro", uri=True)
+
+def quote(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+def class_columns(connection: sqlite3.Connection) -> List[str]:
+    return [row[1] for row in connection.execute('PRAGMA table_info(turmas)')]
+
+def check_columns(connection: sqlite3.Connection, cols: List[str]):
+    unknown = [col for col in cols if col not in class_columns(connection)]
+    if unknown:
+        raise KeyError(f"Colunas inexistentes na tabela de turmas: {unknown}")
+
+def filtered_classes_sql(connection: sqlite3.Connection, min_students: int, max_weekly_classes: int,
+                         filters: Optional[Dict[str, Any]] = None, since: Optional[str] = None,
+                         until: Optional[str] = None) -> Tuple[str, list]:
+    """SELECT das turmas regulares que passam pela limpeza e pelos filtros de apply_filters_and_cleaning.
+
+    'filters' compara colunas da tabela por igualdade e 'since'/'until' limitam o semestre ('2015/1'),
+    todos pelos indices. A coluna 'ordem' (rowid) guarda a ordem das turmas no arquivo de origem.
+    """
+    filters = filters or {}
+    check_columns(connection, list(filters))
+    conditions = ['turma_regular = 1'] + [f'{quote(col)} IS NOT NULL' for col in REQUIRED_COLS]
+    conditions += ['total_alunos_disciplina >= ?', 'carga_semanal_dias <= ?', 'bloco <> ?']
+    params: list = [min_students, max_weekly_classes, BLOCK_NUN]
+    for col, value in filters.items():
+        conditions.append(f'{quote(col)} = ?')
+        params.append(value)
+    for operator, semester in (('>=', since), ('<=', until)):
+        if semester:
+            conditions.append(f'{quote(SEMESTER_COL)} {operator} ?')
+            params.append(semester)
+
+    columns = [quote(col) if col != 'bloco' else 'UPPER(bloco) AS bloco' for col in class_columns(connection)]
+    sql = f"SELECT rowid AS ordem, {', '.join(columns)} FROM turmas WHERE {' AND '.join(conditions)}"
+    return sql, params
+
+def filter_data(connection: sqlite3.Connection, min_students: int = MIN_STUDENTS_FILTER,
+                max_weekly_classes: int = MAX_WEEKLY_CLASSES_FILTER, **kwargs) -> pd.DataFrame:
+    """Turmas regulares filtradas, uma por linha (mesmos argumentos de filtered_classes_sql)."""
+    sql, params = filtered_classes_sql(connection, min_students, max_weekly_classes, **kwargs)
+    return pd.read_sql_query(f"{sql} ORDER BY ordem", connection, params=params)
+
+def aggregate_data(connection: sqlite3.Connection, group_by_cols: List[str], min_students: int = MIN_STUDENTS_FILTER,
+                   max_weekly_classes: int = MAX_WEEKLY_CLASSES_FILTER, value_col: str = 'media_disciplina',
+                   **kwargs) -> pd.DataFrame:
+    """Equivalente em SQL de graphs_analysis.aggregate_data sobre as turmas filtradas.
+
+    Fica a primeira turma de cada (semestre, disciplina, turno, bloco) e, por grupo, a media e o desvio
+    padrao amostral de 'value_col' (0 com uma turma so), com os nomes de colunas de aggregate_data.
+    """
+    check_columns(connection, group_by_cols + [value_col])
+    filtered_sql, params = filtered_classes_sql(connection, min_students, max_weekly_classes, **kwargs)
+    groups = ', '.join(quote(col) for col in group_by_cols)
+    unique_key = ', '.join(quote(col) for col in UNIQUE_CLASS_COLS)
+    value = quote(value_col)
+    has_group = ' AND '.join(f'{quote(col)} IS NOT NULL' for col in group_by_cols)
+    join = ' AND '.join(f'u.{quote(col)} IS g.{quote(col)}' for col in group_by_cols)
+    selected_groups = ', '.join(f'g.{quote(col)}' for col in group_by_cols)
+    # Ordenado pelo semestre, como aggregate_data, e depois pelas demais colunas
+    order = ', '.join(f'g.{quote(col)}' for col in sorted(group_by_cols, key=lambda col: col != SEMESTER_COL))
+
+    sql = f"""
+        WITH filtradas AS ({filtered_sql}),
+        unicas AS (
+            SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {unique_key} ORDER BY ordem) AS posicao FROM filtradas)
+            WHERE posicao = 1 AND {has_group}
+        ),
+        grupos AS (SELECT {groups}, COUNT({value}) AS n, AVG({value}) AS media FROM unicas GROUP BY {groups})
+        SELECT {selected_groups}, g.media AS media_das_medias, g.n AS n,
+               SUM((u.{value} - g.media) * (u.{value} - g.media)) AS m2
+        FROM grupos g JOIN unicas u ON {join}
+        GROUP BY {selected_groups}
+        ORDER BY {order}
+    """
+    aggregated_df = pd.read_sql_query(sql, connection, params=params)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aggregated_df['desvio_padrao_das_medias'] = np.where(aggregated_df['n'] > 1, np.sqrt(aggregated_df['m2'] / (aggregated_df['n'] - 1)), 0.0)
+    return aggregated_df.drop(columns=['n', 'm2'])
+
+def query(connection: sqlite3.Connection, sql: str, params: tuple = ()) -> pd.DataFrame:
+    """Consulta livre sobre as tabelas 'turmas' e 'matriculas'."""
+    return pd.read_sql_query(sql, connection, params=params)
+
+def parse_filters(values: List[str]) -> Dict[str, str]:
+    """'coluna=valor' -> {coluna: valor}."""
+    filters = {}
+    for value in values:
+        col, separator, expected = value.partition('=')
+        if not separator:
+            raise ValueError(f"Filtro inválido '{value}': use coluna=valor.")
+        filters[col] = expected
+    return filters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas às turmas e matrículas salvas pelo pipeline no banco SQLite.")
+    parser.add_argument('--database', type=Path, default=DATABASE_PATH)
+    parser.add_argument('--sql', help="Consulta SQL livre; ignora as demais opções.")
+    parser.add_argument('--group-by', nargs='+', default=[SEMESTER_COL, 'turno_predominante'], help="Colunas do agrupamento.")
+    parser.add_argument('--value', default='media_disciplina', help="Coluna agregada (ex.: taxa_aprovacao).")
+    parser.add_argument('--filter', nargs='*', default=[], help="Filtros coluna=valor, ex.: bloco=FACOM turno_predominante=NOITE.")
+    parser.add_argument('--since', help="Primeiro semestre, ex.: 2015/1.")
+    parser.add_argument('--until', help="Último semestre.")
+    parser.add_argument('--min-students', type=int, default=MIN_STUDENTS_FILTER)
+    parser.add_argument('--max-weekly-classes', type=int, default=MAX_WEEKLY_CLASSES_FILTER)
+    args = parser.parse_args()
+
+    with closing(connect(args.database)) as connection:
+        start = time.perf_counter()
+        if args.sql:
+            result_df = query(connection, args.sql)
+        else:
+            result_df = aggregate_data(connection, args.group_by, args.min_students, args.max_weekly_classes, args.value,
+                                       filters=parse_filters(args.filter), since=args.since, until=args.until)
+        logging.info(f"Consulta respondida em {(time.perf_counter() - start) * 1000:.1f} ms.")
+    print(result_df.to_string(index=False))
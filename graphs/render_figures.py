@@ -0,0 +1,102 @@
+import sys
+import logging
+import argparse
+import importlib.util
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+GRAPHS_FOLDER = Path(__file__).parent
+BASE_PATH = GRAPHS_FOLDER.parent
+# No fim do caminho, para que 'main' continue sendo o pipeline quando ele ja estiver no caminho
+sys.path.append(str(GRAPHS_FOLDER))
+
+import graphs_analysis as comparative
+
+def load_script(name: str, path: Path):
+    """Importa um script pelo caminho (graphs/main.py tem o mesmo nome do pipeline)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+correlation = load_script('graphs_main', GRAPHS_FOLDER / 'main.py')
+
+RESULTS_FOLDER = BASE_PATH / 'results'
+INPUT_CSV_PATH = RESULTS_FOLDER / 'materias_regulares.csv'
+CLASS_TABLE_PATH = RESULTS_FOLDER / 'turmas.csv'
+
+# As tarefas levam so o nome do tipo de figura e os dados ja agregados, que sao pequenos
+FIGURE_RENDERERS = {
+    'correlacao': correlation.plot_correlation_matrix,
+    'comparacao': comparative.create_comparison_plot,
+}
+
+def render_figure(kind: str, kwargs: Dict[str, Any]) -> Path:
+    FIGURE_RENDERERS[kind](**kwargs)
+    return kwargs['output_path']
+
+def build_figure_specs(correlation_stats: Dict[str, Any], comparison_df: pd.DataFrame, results_folder: Path) -> List[Tuple[str, Dict[str, Any]]]:
+    """Agrega os dados de todas as figuras: correlacao, comparacoes por turno e por bloco e turnos de cada bloco."""
+    specs = []
+
+    corr_matrix = correlation.correlation_from_statistics(correlation_stats, correlation.MIN_STUDENTS_FILTER,
+                                                          correlation.MAX_WEEKLY_CLASSES_FILTER)
+    if corr_matrix.isna().all().all():
+        logging.warning("Nenhum dado restou depois dos filtros. O gráfico de correlação nao sera gerado.")
+    else:
+        specs.append(('correlacao', dict(corr_matrix=corr_matrix, output_path=results_folder / 'grafico_correlacao.png',
+                                         config=correlation.PLOT_CONFIG)))
+
+    base_filtered_df = comparative.apply_filters_and_cleaning(comparison_df, comparative.MIN_STUDENTS_FILTER,
+                                                             comparative.MAX_WEEKLY_CLASSES_FILTER)
+    plot_specs = comparative.comparison_plot_specs(base_filtered_df, results_folder)
+    plot_specs += comparative.block_shift_plot_specs(base_filtered_df, results_folder)
+    specs += [('comparacao', plot_spec) for plot_spec in plot_specs]
+    return specs
+
+def render_figure_specs(specs: List[Tuple[str, Dict[str, Any]]], max_workers: Optional[int] = None):
+    logging.info(f"Gerando {len(specs)} figuras em paralelo...")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(render_figure, kind, kwargs): kwargs['output_path'] for kind, kwargs in specs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Erro ao gerar '{futures[future]}': {e}")
+    logging.info("Figuras geradas.")
+
+def run_figure_rendering(input_csv_path: Path = INPUT_CSV_PATH, class_table_path: Path = CLASS_TABLE_PATH,
+                         results_folder: Path = RESULTS_FOLDER, max_workers: Optional[int] = None):
+    """Le os relatorios uma vez e desenha todas as figuras em paralelo, uma por processo."""
+    try:
+        regular_df = correlation.load_analysis_data(input_csv_path)
+        comparison_df = comparative.load_class_table_if_fresh(class_table_path, input_csv_path)
+        if comparison_df is None:
+            comparison_df = regular_df.copy()
+        else:
+            logging.info(f"Usando a tabela por turma: {class_table_path}")
+
+        results_folder.mkdir(parents=True, exist_ok=True)
+        correlation_stats = correlation.load_correlation_statistics(input_csv_path, regular_df)
+        specs = build_figure_specs(correlation_stats, comparison_df, results_folder)
+    except (FileNotFoundError, KeyError) as e:
+        logging.error(f"ERRO CRÍTICO: {e}")
+        return
+
+    render_figure_specs(specs, max_workers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera todas as figuras (correlação, comparações e turnos por bloco) em paralelo.")
+    parser.add_argument('--input', type=Path, default=INPUT_CSV_PATH, help="Relatório de matérias regulares.")
+    parser.add_argument('--class-table', type=Path, default=CLASS_TABLE_PATH, help="Tabela por turma (usada se for mais recente).")
+    parser.add_argument('--output', type=Path, default=RESULTS_FOLDER, help="Pasta das figuras.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos disponíveis).")
+    args = parser.parse_args()
+
+    run_figure_rendering(args.input, args.class_table, args.output, args.workers)
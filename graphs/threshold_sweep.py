@@ -0,0 +1,136 @@
+import sys
+import logging
+import argparse
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+GRAPHS_FOLDER = Path(__file__).parent
+sys.path.append(str(GRAPHS_FOLDER))
+
+from render_figures import correlation, comparative, INPUT_CSV_PATH, CLASS_TABLE_PATH, RESULTS_FOLDER
+
+SWEEP_SUMMARY_FILE = 'varredura_filtros.csv'
+SWEEP_SHIFTS_FILE = 'varredura_turnos.csv'
+
+# Dados de cada processo da varredura, recebidos uma vez na criacao do processo
+_sweep_data: Dict[str, Any] = {}
+
+def parse_thresholds(values: List[str]) -> List[int]:
+    """Aceita inteiros e intervalos 'inicio:fim[:passo]' (fim incluido)."""
+    thresholds = []
+    for value in values:
+        if ':' in value:
+            start, end, *step = (int(part) for part in value.split(':'))
+            thresholds.extend(range(start, end + 1, step[0] if step else 1))
+        else:
+            thresholds.append(int(value))
+    return sorted(set(thresholds))
+
+def build_threshold_index(df: pd.DataFrame) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+    """Para cada valor de carga_semanal_dias, as posicoes das linhas em ordem decrescente de total_alunos_disciplina.
+
+    As linhas com total_alunos >= minimo formam um prefixo de cada lista, achado por busca binaria.
+    """
+    students = df['total_alunos_disciplina'].to_numpy(dtype=float)
+    days = df['carga_semanal_dias'].to_numpy(dtype=float)
+
+    index = {}
+    for day_count in np.unique(days):
+        positions = np.flatnonzero(days == day_count)
+        positions = positions[np.argsort(-students[positions], kind='stable')]
+        index[day_count] = (positions, -students[positions])
+    return index
+
+def select_rows(index: Dict[float, Tuple[np.ndarray, np.ndarray]], min_students: int, max_weekly_classes: int) -> np.ndarray:
+    """Posicoes (na ordem original) das linhas com total_alunos >= min_students e carga <= max_weekly_classes."""
+    parts = [positions[:np.searchsorted(negated_students, -min_students, side='right')]
+             for day_count, (positions, negated_students) in index.items() if day_count <= max_weekly_classes]
+    return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+def init_sweep_worker(base_df: pd.DataFrame, index: dict, correlation_stats: Dict[str, Any]):
+    _sweep_data.update(base_df=base_df, index=index, correlation_stats=correlation_stats)
+
+def evaluate_thresholds(min_students: int, max_weekly_classes: int) -> Tuple[dict, pd.DataFrame]:
+    """Resumo de uma combinacao de filtros e as medias por semestre e turno das turmas selecionadas."""
+    filtered_df = _sweep_data['base_df'].iloc[select_rows(_sweep_data['index'], min_students, max_weekly_classes)]
+    unique_classes_df = filtered_df.drop_duplicates(subset=['Ano/Semestre Disciplina', 'Disciplina', 'turno_predominante', 'bloco'])
+
+    summary = {
+        'min_alunos': min_students,
+        'max_dias_semana': max_weekly_classes,
+        'linhas': len(filtered_df),
+        'turmas': len(unique_classes_df),
+        'media_das_medias': unique_classes_df['media_disciplina'].mean(),
+    }
+    corr_matrix = correlation.correlation_from_statistics(_sweep_data['correlation_stats'], min_students, max_weekly_classes)
+    if 'media_disciplina' in corr_matrix.index:
+        for feature, value in corr_matrix.loc['media_disciplina'].drop('media_disciplina').items():
+            summary[f"corr_media_{feature}"] = value
+
+    shifts_df = comparative.aggregate_data(filtered_df, group_by_cols=['Ano/Semestre Disciplina', 'turno_predominante'])
+    if not shifts_df.empty:
+        shifts_df.insert(0, 'max_dias_semana', max_weekly_classes)
+        shifts_df.insert(0, 'min_alunos', min_students)
+    return summary, shifts_df
+
+def run_threshold_sweep(min_students_values: List[int], max_weekly_classes_values: List[int],
+                        input_csv_path: Path = INPUT_CSV_PATH, class_table_path: Path = CLASS_TABLE_PATH,
+                        results_folder: Path = RESULTS_FOLDER, max_workers: Optional[int] = None):
+    """Avalia todas as combinacoes de filtros sobre os dados carregados e limpos uma unica vez."""
+    try:
+        regular_df = correlation.load_analysis_data(input_csv_path)
+        raw_df = comparative.load_class_table_if_fresh(class_table_path, input_csv_path)
+        if raw_df is None:
+            raw_df = regular_df.copy()
+        else:
+            logging.info(f"Usando a tabela por turma: {class_table_path}")
+        # Limpeza sem limites: os filtros de cada combinacao saem do indice
+        base_df = comparative.apply_filters_and_cleaning(raw_df, float('-inf'), float('inf')).reset_index(drop=True)
+        correlation_stats = correlation.load_correlation_statistics(input_csv_path, regular_df)
+    except (FileNotFoundError, KeyError) as e:
+        logging.error(f"ERRO CRÍTICO: {e}")
+        return
+
+    sweep_thresholds(base_df, correlation_stats, min_students_values, max_weekly_classes_values, results_folder, max_workers)
+
+def sweep_thresholds(base_df: pd.DataFrame, correlation_stats: Dict[str, Any], min_students_values: List[int],
+                     max_weekly_classes_values: List[int], results_folder: Path = RESULTS_FOLDER, max_workers: Optional[int] = None):
+    """Avalia as combinacoes sobre 'base_df', ja limpo por apply_filters_and_cleaning sem limites."""
+    base_df = base_df.reset_index(drop=True)
+    index = build_threshold_index(base_df)
+    combinations = list(product(min_students_values, max_weekly_classes_values))
+    logging.info(f"Avaliando {len(combinations)} combinações de filtros...")
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_sweep_worker,
+                             initargs=(base_df, index, correlation_stats)) as executor:
+        results = list(executor.map(evaluate_thresholds, *zip(*combinations)))
+
+    results_folder.mkdir(parents=True, exist_ok=True)
+    summary_df = pd.DataFrame([summary for summary, _ in results])
+    summary_df.to_csv(results_folder / SWEEP_SUMMARY_FILE, index=False, encoding='utf-8')
+    shift_frames = [shifts_df for _, shifts_df in results if not shifts_df.empty]
+    if shift_frames:
+        pd.concat(shift_frames, ignore_index=True).to_csv(results_folder / SWEEP_SHIFTS_FILE, index=False, encoding='utf-8')
+    logging.info(f"Resultados da varredura salvos em: {results_folder / SWEEP_SUMMARY_FILE} e {results_folder / SWEEP_SHIFTS_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varre combinações dos filtros de número de alunos e dias por semana.")
+    parser.add_argument('--min-students', nargs='+', default=[str(comparative.MIN_STUDENTS_FILTER)],
+                        help="Valores mínimos de alunos, como inteiros ou intervalos 'inicio:fim[:passo]'.")
+    parser.add_argument('--max-weekly-classes', nargs='+', default=[str(comparative.MAX_WEEKLY_CLASSES_FILTER)],
+                        help="Valores máximos de dias por semana, como inteiros ou intervalos 'inicio:fim[:passo]'.")
+    parser.add_argument('--input', type=Path, default=INPUT_CSV_PATH, help="Relatório de matérias regulares.")
+    parser.add_argument('--class-table', type=Path, default=CLASS_TABLE_PATH, help="Tabela por turma (usada se for mais recente).")
+    parser.add_argument('--output', type=Path, default=RESULTS_FOLDER, help="Pasta dos resultados.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos disponíveis).")
+    args = parser.parse_args()
+
+    run_threshold_sweep(parse_thresholds(args.min_students), parse_thresholds(args.max_weekly_classes),
+                        args.input, args.class_table, args.output, args.workers)
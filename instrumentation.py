@@ -0,0 +1,97 @@
+import time
+import json
+import pstats
+import cProfile
+import logging
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_KEY = '_perfil'
+
+def count_rows(value) -> Optional[int]:
+    """Linhas de um DataFrame, ou a soma das linhas de uma tupla de DataFrames."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, tuple) and value and all(isinstance(item, pd.DataFrame) for item in value):
+        return sum(len(item) for item in value)
+    return None
+
+def max_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def run_stage(stages: Optional[List[dict]], name: str, func: Callable, *args, profile: bool = False, trace_memory: bool = False):
+    """Executa uma etapa do pipeline e, se 'stages' nao for None, registra suas medidas nele.
+
+    Mede tempo de parede, tempo de CPU, linhas de entrada (primeiro argumento) e de saida e o RSS
+    maximo do processo ao final da etapa. Com 'trace_memory', mede tambem o pico de memoria alocada
+    (tracemalloc), que deixa as etapas varias vezes mais lentas.
+    """
+    if stages is None:
+        return func(*args)
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile() if profile else None
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    result = func(*args)
+    if profiler:
+        profiler.disable()
+    wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if started_tracing:
+        tracemalloc.stop()
+
+    stages.append({
+        'etapa': name,
+        'tempo_s': round(wall_time, 4),
+        'cpu_s': round(cpu_time, 4),
+        'linhas_entrada': count_rows(args[0]) if args else None,
+        'linhas_saida': count_rows(result),
+        'pico_alocado_mib': round(peak / 2**20, 2) if peak is not None else None,
+        'rss_max_mib': max_rss_mib(),
+        PROFILE_KEY: profiler,
+    })
+    return result
+
+def format_stage_report(stages: List[dict]) -> str:
+    header = f"{'Etapa':<40} {'Tempo (s)':>10} {'CPU (s)':>10} {'Entrada':>10} {'Saída':>10} {'Pico (MiB)':>11} {'RSS (MiB)':>10}"
+    lines = [header, '-' * len(header)]
+    for stage in stages:
+        rows_in = '' if stage['linhas_entrada'] is None else stage['linhas_entrada']
+        rows_out = '' if stage['linhas_saida'] is None else stage['linhas_saida']
+        peak = '' if stage['pico_alocado_mib'] is None else f"{stage['pico_alocado_mib']:.1f}"
+        rss = '' if stage['rss_max_mib'] is None else f"{stage['rss_max_mib']:.1f}"
+        lines.append(f"{stage['etapa']:<40} {stage['tempo_s']:>10.3f} {stage['cpu_s']:>10.3f} {rows_in:>10} {rows_out:>10} "
+                     f"{peak:>11} {rss:>10}")
+    lines.append(f"{'Total':<40} {sum(stage['tempo_s'] for stage in stages):>10.3f}")
+    return '\n'.join(lines)
+
+def save_stage_report(stages: List[dict], output_path: Path, profile_path: Optional[Path] = None):
+    """Grava as medidas em JSON e, se pedido, o perfil (pstats) da etapa mais lenta."""
+    records = [{key: value for key, value in stage.items() if key != PROFILE_KEY} for stage in stages]
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(records, file, ensure_ascii=False, indent=2)
+    logging.info(f"Medidas por etapa salvas em: {output_path}")
+
+    profiled = [stage for stage in stages if stage.get(PROFILE_KEY) is not None]
+    if profile_path and profiled:
+        slowest = max(profiled, key=lambda stage: stage['tempo_s'])
+        pstats.Stats(slowest[PROFILE_KEY]).dump_stats(profile_path)
+        logging.info(f"Perfil da etapa mais lenta ('{slowest['etapa']}') salvo em: {profile_path}")
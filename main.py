@@ -1,9 +1,24 @@
 import pandas as pd
 from pathlib import Path
-from datetime import time
+from datetime import time, datetime
 import numpy as np
 import logging
-from typing import List
+import hashlib
+import json
+import glob
+import sys
+import os
+import re
+import sqlite3
+import tempfile
+import unicodedata
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Union
+
+from instrumentation import run_stage, format_stage_report, save_stage_report
+from columnar import INPUT_HASH_KEY, REPORT_HASH_KEY, hash_input_files
 
 MORNING_SHIFT = (time(7, 0, 0), time(11, 25, 0))
 AFTERNOON_SHIFT = (time(13, 0, 0), time(16, 59, 0))
@@ -11,6 +26,34 @@ NIGHT_SHIFT = (time(17, 0, 0), time(23, 0, 0))
 
 KEY_COLS = ['RGA', 'Disciplina', 'Ano/Semestre Disciplina']
 GRADE_KEY_COLS = ['Disciplina', 'Ano/Semestre Disciplina', 'grade_horarios_aluno']
+SCHEDULE_SLOT_COLS = ['Dia da Semana', 'Horário Início']
+CATEGORICAL_OUTPUT_COLS = ['Curso', 'Disciplina', 'bloco', 'turno_predominante']
+CLASS_ID_COL = 'id_turma'
+CLASS_SCHEDULE_COL = 'horarios'
+CLASS_TABLE_COLS = [CLASS_ID_COL, 'Disciplina', 'Ano/Semestre Disciplina', CLASS_SCHEDULE_COL, 'bloco', 'turma_regular', 'turno_predominante',
+                    'peso_final', 'total_alunos_disciplina', 'carga_semanal_dias', 'media_disciplina', 'desvio_padrao',
+                    'taxa_aprovacao', 'taxa_reprovacao']
+
+# Colunas repetitivas viram categoricas (codigos inteiros de largura fixa), o que preserva o texto
+# original nos relatorios; as notas tambem, pois tem poucos valores distintos e aceitam virgula decimal.
+# O texto das notas segue intacto para a saida e os calculos usam colunas float64 a parte.
+PARSED_DECIMAL_COLS = {'Média Final': 'Media-Final-Float', '% Frequência': 'Frequencia-Float'}
+ENROLLMENT_SCHEMA = {
+    'Curso': 'category',
+    'Ano/Semestre Ingresso': 'category',
+    'Sexo': 'category',
+    'Data Nascimento': 'category',
+    'Ano/Semestre Disciplina': 'category',
+    'Disciplina': 'category',
+    'Dia da Semana': 'category',
+    'Horário Início': 'category',
+    'Horário Fim': 'category',
+    'Média Final': 'category',
+    '% Frequência': 'category',
+    'Situação Final': 'category',
+}
+# Dias da semana pelo nome normalizado sem '-feira', de segunda (0) a domingo (6)
+WEEKDAYS = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
 FINAL_SITUATION_COL = 'Situação Final'
 APPROVED_STATUS = 'AP'
 
@@ -30,97 +73,281 @@ TIME_WEIGHT = {
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def is_time_in_valid_ranges(current_time: time) -> bool:
-    if not isinstance(current_time, time):
-        return False
-    
-    for start_time, end_time in TIME_WEIGHT.values():
-        if start_time <= current_time <= end_time:
-            return True
-    return False
-def is_time_in_range(time_to_check: time, interval: tuple[time, time]) -> bool:
-        start_time, end_time = interval
-        return start_time <= time_to_check <= end_time
-      
-def get_shift(current_time: time):
-    for shift, interval in SHIFTS.items():
-        if is_time_in_range(current_time, interval):
-            return shift
-    return "shift_undefined"
-
-def get_time_weight(current_time: time) -> int:
-    for weight, interval in TIME_WEIGHT.items():
-        if is_time_in_range(current_time, interval): return weight
-        
-    raise ValueError(f"Time weight undefined for the time {current_time}.")
+SHIFT_UNDEFINED = "shift_undefined"
+
+UNMAPPED_BLOCK = 'N/A'
+BLOCK_INDEX_VERSION = 1
+# Versao das metricas e do formato dos relatorios: aumente sempre que um calculo ou uma coluna mudar,
+# para que o modo incremental refaca as particoes gravadas por uma versao anterior
+REPORT_FORMAT_VERSION = 1
+
+def time_to_seconds(current_time: time) -> int:
+    return current_time.hour * 3600 + current_time.minute * 60 + current_time.second
+
+def first_matching_interval(seconds: int, intervals: dict):
+    for label, (start_time, end_time) in intervals.items():
+        if time_to_seconds(start_time) <= seconds <= time_to_seconds(end_time):
+            return label
+    return None
+
+def build_time_bins(shifts: dict, time_weights: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Quebra o dia em faixas elementares onde turno e peso sao constantes.
+
+    Os fins de intervalo sao inclusivos, entao a faixa seguinte comeca em fim + 1s.
+    Cada faixa e rotulada pela mesma regra de primeira ocorrencia das tabelas.
+    """
+    bounds = {0}
+    for start_time, end_time in [*shifts.values(), *time_weights.values()]:
+        bounds.update((time_to_seconds(start_time), time_to_seconds(end_time) + 1))
+    boundaries = np.array(sorted(bounds), dtype=np.int64)
+
+    bin_shifts = [first_matching_interval(b, shifts) for b in boundaries]
+    bin_weights = [first_matching_interval(b, time_weights) for b in boundaries]
+
+    bin_valid = np.array([w is not None for w in bin_weights], dtype=bool)
+    bin_shifts = np.array([s if s is not None else SHIFT_UNDEFINED for s in bin_shifts], dtype=object)
+    bin_weights = np.array([w if w is not None else 0 for w in bin_weights], dtype=np.int64)
+    return boundaries, bin_valid, bin_shifts, bin_weights
+
+def classify_start_times(seconds: np.ndarray, shifts: dict, time_weights: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Retorna (horario valido, turno, peso) para cada horario em segundos desde a meia-noite."""
+    boundaries, bin_valid, bin_shifts, bin_weights = build_time_bins(shifts, time_weights)
+    bins = np.searchsorted(boundaries, seconds, side='right') - 1
+    return bin_valid[bins], bin_shifts[bins], bin_weights[bins]
+
+def enrollment_read_options(usecols: Optional[List[str]] = None) -> dict:
+    dtypes = {col: dtype for col, dtype in ENROLLMENT_SCHEMA.items() if usecols is None or col in usecols}
+    return {'encoding': 'utf-8', 'dtype': dtypes, 'usecols': usecols}
+
+def parse_time_seconds(value) -> float:
+    try:
+        parsed = datetime.strptime(str(value), '%H:%M:%S')
+    except ValueError:
+        return np.nan
+    return float(parsed.hour * 3600 + parsed.minute * 60 + parsed.second)
+
+def parse_date_ordinal(value) -> float:
+    try:
+        return float(datetime.strptime(str(value), '%d/%m/%Y').toordinal())
+    except ValueError:
+        return np.nan
+
+def parse_term_index(value) -> float:
+    """'2011/2' -> 2011 * 2 + 1: semestres seguidos tem indices seguidos."""
+    match = re.fullmatch(r'\s*(\d{4})\s*/\s*([12])\s*', str(value))
+    return float(int(match.group(1)) * 2 + int(match.group(2)) - 1) if match else np.nan
+
+def parse_decimal(value) -> float:
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+def parse_weekday(value) -> float:
+    day = normalize_discipline_name(value).split('-')[0]
+    return float(WEEKDAYS.index(day)) if day in WEEKDAYS else np.nan
+
+PARSERS: Dict[str, Callable] = {
+    'hora': parse_time_seconds,
+    'data': parse_date_ordinal,
+    'semestre': parse_term_index,
+    'decimal': parse_decimal,
+    'dia': parse_weekday,
+}
+
+# Valores ja convertidos por tipo, compartilhados por todos os arquivos e lotes lidos neste processo
+_parsed_values: Dict[str, dict] = {kind: {} for kind in PARSERS}
+
+def parse_column(values: pd.Series, kind: str) -> np.ndarray:
+    """Converte so os valores distintos da coluna (tipos em PARSERS) e replica o resultado pelos codigos.
+
+    O custo por linha fica restrito ao factorize, que em colunas categoricas apenas reaproveita os codigos.
+    Valores nulos ou invalidos viram NaN.
+    """
+    codes, uniques = pd.factorize(values)
+    cache, parser = _parsed_values[kind], PARSERS[kind]
+    parsed = [cache[value] if value in cache else cache.setdefault(value, parser(value)) for value in np.asarray(uniques)]
+    return np.append(np.array(parsed, dtype=float), np.nan)[codes]
 
-def load_data_csv(input_path: Path) -> pd.DataFrame:
+def read_enrollment_chunks(input_path: Path, chunksize: int, usecols: Optional[List[str]] = None):
+    for chunk in pd.read_csv(input_path, chunksize=chunksize, **enrollment_read_options(usecols)):
+        yield chunk
+
+def estimate_object_memory(df: pd.DataFrame) -> int:
+    """Estimativa do tamanho do mesmo DataFrame com texto em objetos Python e numeros em float64."""
+    total = 0
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts = series.value_counts(sort=False)
+            total += len(series) * 8 + sum(count * sys.getsizeof(value) for value, count in counts.items())
+        else:
+            total += int(series.memory_usage(index=False, deep=True))
+    return total
+
+def load_data_csv(input_path: Path, usecols: Optional[List[str]] = None) -> pd.DataFrame:
 
         logging.info(f"Carregando dados de '{input_path}'...")
 
         if not input_path:
             raise FileNotFoundError(f"Arquivo nao encontrado em: '{input_path}'...")
         
-        df = pd.read_csv(input_path, encoding='utf-8')
+        df = pd.read_csv(input_path, **enrollment_read_options(usecols))
         logging.info(f"Dados carregados com sucesso. Total de {len(df)} registros.")
+
+        compact_size = df.memory_usage(index=False, deep=True).sum()
+        plain_size = estimate_object_memory(df)
+        logging.info(f"Memória dos dados: {compact_size / 2**20:.1f} MiB (~{plain_size / 2**20:.1f} MiB com texto em objetos Python, "
+                     f"{plain_size / max(compact_size, 1):.1f}x maior).")
         return df
 
-def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+def hash_rows(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy().view(np.int64)
+
+def schedule_slot_hashes(df: pd.DataFrame) -> np.ndarray:
+    return (pd.util.hash_pandas_object(df[SCHEDULE_SLOT_COLS], index=False).to_numpy() >> np.uint64(8)).astype(np.int64)
+
+def finalize_schedule_fingerprint(schedule_sum: np.ndarray) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(schedule_sum, dtype=np.int64)).view(np.int64)
+
+def compute_schedule_fingerprint(df: pd.DataFrame) -> pd.Series:
+    """Identificador int64 do conjunto de horarios (dia, inicio) de cada aluno na disciplina/semestre.
+
+    Cada horario distinto recebe um hash estavel de 56 bits; a soma desses hashes nao depende da
+    ordem das linhas e e misturada de volta para 64 bits, o que dispensa o apply por grupo.
+    """
+    slot_hash = schedule_slot_hashes(df)
+    slot_hash[df.duplicated(subset=KEY_COLS + SCHEDULE_SLOT_COLS).to_numpy()] = 0
+
+    schedule_sum = pd.Series(slot_hash, index=df.index).groupby([df[col] for col in KEY_COLS], sort=False, dropna=False, observed=True).transform('sum')
+    return pd.Series(finalize_schedule_fingerprint(schedule_sum.to_numpy()), index=df.index)
+
+def describe_schedules(df: pd.DataFrame) -> pd.Series:
+    """Recupera a grade legivel (tuplas ordenadas de dia e horario) de cada 'grade_horarios_aluno'."""
+    slots = df.drop_duplicates(subset=['grade_horarios_aluno'] + SCHEDULE_SLOT_COLS).sort_values(SCHEDULE_SLOT_COLS)
+    schedules = slots.groupby('grade_horarios_aluno')[SCHEDULE_SLOT_COLS].apply(lambda x: tuple(tuple(y) for y in x.values))
+    schedules.name = 'grade_horarios_legivel'
+    return schedules
+
+def preprocess_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpeza e classificacao linha a linha; nao depende de outras linhas do arquivo."""
 
     df = df[df['Dia da Semana'] != 'EAD'].copy()
    
 
-    df['Horario-Inicio-Time'] = pd.to_datetime(df['Horário Início'], format='%H:%M:%S', errors='coerce').dt.time
-    df.dropna(subset=['Horario-Inicio-Time'], inplace=True)
+    start_seconds = parse_column(df['Horário Início'], 'hora')
+    has_start = ~np.isnan(start_seconds)
+    df = df[has_start].copy()
+    df['Horario-Inicio-Segundos'] = start_seconds[has_start].astype(np.int64)
+
+    is_valid, shifts, weights = classify_start_times(df['Horario-Inicio-Segundos'].to_numpy(), SHIFTS, TIME_WEIGHT)
 
     before_register = len(df)
-    df = df[df['Horario-Inicio-Time'].apply(is_time_in_valid_ranges)]
+    df = df[is_valid].copy()
     after_register = len(df)
     logging.info(f"Removidos {before_register - after_register} registros de horarios invalidos.")
 
-    df['Media-Final-Float'] = pd.to_numeric(df['Média Final'].astype(str).str.replace(',', '.'), errors='coerce')
+    for col, parsed_col in PARSED_DECIMAL_COLS.items():
+        if col in df.columns:
+            df[parsed_col] = parse_column(df[col], 'decimal')
 
-    df['Turno'] = df['Horario-Inicio-Time'].apply(get_shift)
-    df['Peso-Horario'] = df['Horario-Inicio-Time'].apply(get_time_weight)
+    df['Turno'] = shifts[is_valid]
+    df['Peso-Horario'] = weights[is_valid]
 
-    student_schedule = df.groupby(['RGA', 'Disciplina', 'Ano/Semestre Disciplina'])[['Dia da Semana', 'Horário Início']].apply(
-        lambda x: frozenset(sorted(tuple(y) for y in x.values))
-    )
-    student_schedule.name = 'grade_horarios_aluno'
-    df = df.merge(student_schedule, on=['RGA', 'Disciplina', 'Ano/Semestre Disciplina'], how='left')
+    return df
 
+def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+    df = preprocess_rows(df)
+    df['grade_horarios_aluno'] = compute_schedule_fingerprint(df)
     return df
 
 
-def calculate_approval_rates(df: pd.DataFrame) -> pd.DataFrame:
-    
-    group_sizes = df.groupby(GRADE_KEY_COLS).size().reset_index(name='total_na_turma')
+def factorize_class_keys(df: pd.DataFrame) -> tuple[np.ndarray, pd.DataFrame]:
+    """Codifica cada turma (GRADE_KEY_COLS) como um inteiro, na mesma ordem do groupby.
 
-    approved = df[df[FINAL_SITUATION_COL] == APPROVED_STATUS].groupby(GRADE_KEY_COLS).size().reset_index(name='total_aprovados')
+    Linhas com chave nula recebem o codigo -1, assim como o groupby as descartaria.
+    """
+    keys = df[GRADE_KEY_COLS]
+    has_key = keys.notna().all(axis=1).to_numpy()
 
-    rates_df = pd.merge(group_sizes, approved, on=GRADE_KEY_COLS, how='left')
-    rates_df['total_aprovados'] = rates_df['total_aprovados'].fillna(0)
+    codes = np.full(len(df), -1, dtype=np.int64)
+    key_codes, uniques = pd.MultiIndex.from_frame(keys[has_key]).factorize(sort=True)
+    codes[has_key] = key_codes
+    return codes, uniques.to_frame(index=False, name=GRADE_KEY_COLS)
 
-    rates_df['taxa_aprovacao'] = rates_df['total_aprovados'] / rates_df['total_na_turma']
-    rates_df['taxa_reprovacao'] = 1 - rates_df['taxa_aprovacao']
+def distinct_per_class(class_codes: np.ndarray, values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Pares (turma, valor) distintos: retorna o codigo da turma e o indice da primeira linha de cada par."""
+    value_codes, value_uniques = pd.factorize(values, use_na_sentinel=False)
+    pair_codes = class_codes * (len(value_uniques) + 1) + value_codes
+    _, first_rows = np.unique(pair_codes, return_index=True)
+    return class_codes[first_rows], first_rows
 
-    return rates_df.drop(columns=['total_na_turma', 'total_aprovados'])
+def combine_moments(codes: np.ndarray, counts, means, m2s, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Junta momentos (contagem, media, M2) de particoes com o mesmo codigo pela formula paralela de Welford.
 
-def aggregate_class_metrics (df: pd.DataFrame) -> pd.DataFrame:
-    
-    aggregations = {
-        'total_alunos_disciplina': pd.NamedAgg(column='RGA', aggfunc='nunique'),
-        'carga_semanal_dias': pd.NamedAgg(column='Dia da Semana', aggfunc='nunique'),
-        'turnos_distintos': pd.NamedAgg(column='Turno', aggfunc=lambda x: frozenset(x.unique())),
-        'media_disciplina': pd.NamedAgg(column='Media-Final-Float', aggfunc='mean'),
-        'desvio_padrao': pd.NamedAgg(column='Media-Final-Float', aggfunc='std')
-    }
-    classes_df = df.groupby(GRADE_KEY_COLS).agg(**aggregations).reset_index()
+    O resultado equivale ao calculado de uma vez sobre todos os valores, qualquer que seja a divisao em
+    lotes, arquivos ou processos; grupos sem valores ficam com media NaN.
+    """
+    counts = np.asarray(counts, dtype=float)
+    has_values = counts > 0
+    means = np.where(has_values, means, 0.0)
+    total = np.bincount(codes, weights=counts, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes, weights=counts * means, minlength=size) / total
+    deviation = np.where(has_values, means - mean[codes], 0.0)
+    m2 = np.bincount(codes, weights=np.where(has_values, m2s, 0.0) + counts * deviation ** 2, minlength=size)
+    return total, mean, m2
+
+def class_grade_moments(class_codes: np.ndarray, student_counts, student_means, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Momentos das notas de cada turma com cada aluno contado uma vez (pela media das suas linhas),
+    como em trash/principal.py, e nao uma vez por encontro semanal."""
+    has_grade = np.asarray(student_counts) > 0
+    return combine_moments(class_codes, has_grade, student_means, np.zeros(len(class_codes)), size)
+
+def sample_std(count: np.ndarray, m2: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)
+
+def aggregate_class_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """Calcula todas as metricas por turma em uma unica passada sobre os codigos das turmas."""
+    class_codes, classes_df = factorize_class_keys(df)
+    n_classes = len(classes_df)
 
-    classes_weight = df.drop_duplicates(subset=GRADE_KEY_COLS + ['Dia da Semana']) \
-                       .groupby(GRADE_KEY_COLS)['Peso-Horario'].sum().reset_index(name='soma_pesos_horario')
+    rows = class_codes >= 0
+    codes = class_codes[rows]
+    df = df[rows]
 
-    classes_df = classes_df.merge(classes_weight, on=GRADE_KEY_COLS, how='left')
+    total_rows = np.bincount(codes, minlength=n_classes)
+    approved = np.bincount(codes, weights=(df[FINAL_SITUATION_COL] == APPROVED_STATUS).to_numpy(dtype=float), minlength=n_classes)
+
+    rga_classes, rga_rows = distinct_per_class(codes, df['RGA'])
+    rga_classes = rga_classes[df['RGA'].notna().to_numpy()[rga_rows]]
+
+    day_classes, day_rows = distinct_per_class(codes, df['Dia da Semana'])
+    day_classes_not_null = day_classes[df['Dia da Semana'].notna().to_numpy()[day_rows]]
+
+    shift_codes, shift_labels = pd.factorize(df['Turno'])
+    shift_classes, shift_rows = distinct_per_class(codes, df['Turno'])
+    shift_bits = np.left_shift(1, shift_codes[shift_rows])
+    shift_masks = np.bincount(shift_classes, weights=shift_bits, minlength=n_classes).astype(np.int64)
+    shift_sets = {mask: frozenset(label for bit, label in enumerate(shift_labels) if mask >> bit & 1)
+                  for mask in np.unique(shift_masks)}
+
+    student_codes, student_keys = pd.factorize(hash_rows(df, KEY_COLS))
+    _, student_first_rows = np.unique(student_codes, return_index=True)
+    grades = df['Media-Final-Float'].to_numpy(dtype=float)
+    student_n, student_mean, _ = combine_moments(student_codes, ~np.isnan(grades), grades, np.zeros(len(grades)), len(student_keys))
+    grade_n, grade_mean, grade_m2 = class_grade_moments(codes[student_first_rows], student_n, student_mean, n_classes)
+
+    classes_df['total_alunos_disciplina'] = np.bincount(rga_classes, minlength=n_classes)
+    classes_df['carga_semanal_dias'] = np.bincount(day_classes_not_null, minlength=n_classes)
+    classes_df['turnos_distintos'] = [shift_sets[mask] for mask in shift_masks]
+    classes_df['media_disciplina'] = grade_mean
+    classes_df['desvio_padrao'] = sample_std(grade_n, grade_m2)
+    weights = df['Peso-Horario'].to_numpy()
+    classes_df['soma_pesos_horario'] = np.bincount(day_classes, weights=weights[day_rows], minlength=n_classes).astype(weights.dtype)
+    classes_df['taxa_aprovacao'] = approved / total_rows
+    classes_df['taxa_reprovacao'] = 1 - classes_df['taxa_aprovacao']
 
     return classes_df
 
@@ -135,27 +362,100 @@ def calculate_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
+def normalize_discipline_name(name: str) -> str:
+    """Chave de busca no mapa de blocos: minusculas, sem acentos e com espacos simples
+    (mesma ideia de normalizar_nome_curso em trash/semeste-do-curso.py)."""
+    name = unicodedata.normalize('NFKD', str(name).lower()).encode('ASCII', 'ignore').decode('ASCII')
+    return re.sub(r'\s+', ' ', name).strip()
+
+def block_index_cache_path(blocks_map_path: Path) -> Path:
+    blocks_map_path = Path(blocks_map_path)
+    return blocks_map_path.with_name(f".{blocks_map_path.stem}.indice.json")
+
+def build_block_index(blocks_map_path: Path) -> dict:
+    # O mapa nao tem cabecalho: a primeira linha ja e uma disciplina
+    blocks_map_df = pd.read_csv(blocks_map_path, header=None, names=['Disciplina', 'bloco'])
+    index = {}
+    for name, block in zip(blocks_map_df['Disciplina'], blocks_map_df['bloco']):
+        if pd.isna(name) or pd.isna(block):
+            continue
+        key, block = normalize_discipline_name(name), block.strip()
+        if index.setdefault(key, block) != block:
+            logging.warning(f"Disciplina '{name}' aparece com blocos diferentes no mapa; mantido '{index[key]}'.")
+    return index
+
+def load_block_index(blocks_map_path: Path) -> dict:
+    """Indice {disciplina normalizada: bloco}, salvo ao lado do mapa e refeito quando o mapa muda (mtime)."""
+    stat = Path(blocks_map_path).stat()
+    signature = {'versao': BLOCK_INDEX_VERSION, 'mtime_ns': stat.st_mtime_ns, 'tamanho': stat.st_size}
+    cache_path = block_index_cache_path(blocks_map_path)
+    try:
+        with open(cache_path, encoding='utf-8') as file:
+            cached = json.load(file)
+        if cached.get('assinatura') == signature:
+            return cached['indice']
+    except (OSError, ValueError):
+        pass
+
+    index = build_block_index(blocks_map_path)
+    # Grava em um arquivo temporario e troca de uma vez: varios processos podem refazer o indice juntos
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'assinatura': signature, 'indice': index}, file, ensure_ascii=False)
+        temp_path.replace(cache_path)
+    except OSError as e:
+        logging.warning(f"Não foi possível salvar o índice de blocos em '{cache_path}': {e}")
+    return index
+
+def lookup_blocks(disciplines: pd.Series, block_index: dict) -> pd.Categorical:
+    """Bloco de cada linha: normaliza so os nomes distintos e replica o resultado pelos codigos."""
+    if isinstance(disciplines.dtype, pd.CategoricalDtype):
+        codes, names = disciplines.cat.codes.to_numpy(), disciplines.cat.categories
+    else:
+        codes, names = pd.factorize(disciplines)
+
+    block_codes, blocks = pd.factorize(np.array(
+        [block_index.get(normalize_discipline_name(name), UNMAPPED_BLOCK) for name in names] + [UNMAPPED_BLOCK], dtype=object))
+    # codigo -1 (disciplina nula) cai no ultimo elemento, que e UNMAPPED_BLOCK
+    return pd.Categorical.from_codes(block_codes[codes], categories=blocks)
+
 def add_block_information(df: pd.DataFrame, blocks_map_path: str) -> pd.DataFrame:
     try:
-        blocks_map_df = pd.read_csv(blocks_map_path, header=0, names=['Disciplina', 'bloco'])
-        df = df.merge(blocks_map_df, on='Disciplina', how='left')
-        df['bloco'] = df['bloco'].str.strip()
-        df['bloco'] = df['bloco'].fillna('N/A')
+        df['bloco'] = lookup_blocks(df['Disciplina'], load_block_index(blocks_map_path))
     except FileNotFoundError:
         print(f"ATTENTION: File not found: {blocks_map_path}.")
-        df['bloco'] = 'N/A'
+        df['bloco'] = UNMAPPED_BLOCK
     return df
 
-def format_data_for_output(df: pd.DataFrame) -> pd.DataFrame:
+def unmapped_disciplines(df: pd.DataFrame) -> pd.DataFrame:
+    """Disciplinas sem bloco no mapa, com o numero de linhas de cada uma em 'df' (maiores primeiro)."""
+    counts = df.loc[df['bloco'] == UNMAPPED_BLOCK, 'Disciplina'].value_counts(sort=True)
+    return counts[counts > 0].rename_axis('Disciplina').reset_index(name='linhas')
+
+def save_unmapped_disciplines_report(df: pd.DataFrame, output_path: Path):
+    report = unmapped_disciplines(df)
+    report.to_csv(output_path, index=False, encoding='utf-8')
+    logging.info(f"{len(report)} disciplinas sem bloco ({report['linhas'].sum()} linhas) listadas em: {output_path}")
+
+FORMAT_COLS = ['peso_final', 'media_disciplina', 'desvio_padrao', 'taxa_aprovacao', 'taxa_reprovacao']
 
-    logging.info("Formatando colunas numéricas para o relatório final...")
-    df_formatted = df.copy() 
+def format_decimals(series: pd.Series, decimals: int = 2) -> pd.Series:
+    """'{:.Nf}' aplicado so aos valores distintos (poucos, pois sao metricas de turma) e replicado pelos codigos."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    formatted = np.array([f'{value:.{decimals}f}' for value in uniques], dtype=object)
+    return pd.Series(formatted[codes], index=series.index)
+
+def format_for_output(output_df: pd.DataFrame) -> pd.DataFrame:
+    """Formata as metricas com duas casas apenas no momento de gravar, coluna a coluna e sem copiar o DataFrame.
+
+    Recebe a selecao de colunas feita para a gravacao; o DataFrame de origem segue numerico.
+    """
+    for col in FORMAT_COLS:
+        if col in output_df.columns:
+            output_df[col] = format_decimals(output_df[col])
+    return output_df
 
-    format_cols = ['peso_final', 'media_disciplina', 'desvio_padrao', 'taxa_aprovacao', 'taxa_reprovacao']
-    for col in format_cols:
-        if col in df_formatted.columns:
-            df_formatted[col] = df_formatted[col].map('{:.2f}'.format)
-    return df_formatted
 def separate_regular_and_irregular_classes(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     
     logging.info("Separando turmas em regulares e irregulares...")
@@ -166,41 +466,834 @@ def separate_regular_and_irregular_classes(df: pd.DataFrame) -> tuple[pd.DataFra
 
     return regular_df, irregular_df
 
-def prepare_and_save_csv(df: pd.DataFrame, columns_to_keep: List[str], output_path: Path):
+def drop_duplicate_rows(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Remove linhas repetidas nas colunas indicadas, comparando uma hash por linha.
+
+    As metricas de turma dependem so das colunas originais, entao chamar esta funcao com o
+    cabecalho original antes do enriquecimento remove exatamente as linhas repetidas dos relatorios.
+    """
+    return df[~pd.Series(hash_rows(df, columns)).duplicated().to_numpy()]
+
+def prepare_and_save_csv(df: pd.DataFrame, columns_to_keep: List[str], output_path: Path, deduplicate: bool = True):
 
     final_columns = [col for col in columns_to_keep if col in df.columns]
     
-    output_df = df[final_columns].drop_duplicates()
+    output_df = df[final_columns]
+    if deduplicate:
+        output_df = drop_duplicate_rows(output_df, final_columns)
+    output_df = format_for_output(output_df)
     
     output_df.to_csv(output_path, index=False, encoding='utf-8')
     logging.info(f"Relatório salvo com sucesso em: {output_path}")
 
-def run_analysis_pipeline(input_path: Path, regular_output_path: Path, irregular_output_path: Path, blocks_map_path: Path):
+def enrich_rows(processed_df: pd.DataFrame, class_metrics_df: pd.DataFrame, blocks_map_path: Path) -> pd.DataFrame:
+    df_with_metrics = merge_classes_metrics(processed_df, class_metrics_df)
+    df_with_derived_metrics = calculate_derived_metrics(df_with_metrics)
+    return add_block_information(df_with_derived_metrics, blocks_map_path)
+
+def build_class_table(processed_df: pd.DataFrame, class_metrics_df: pd.DataFrame, blocks_map_path: Path) -> pd.DataFrame:
+    """Uma linha por turma, com as mesmas metricas que os relatorios repetem em cada linha de aluno.
+
+    As turmas ficam na ordem em que aparecem no arquivo, como nos relatorios por linha.
+    """
+    classes_df = calculate_derived_metrics(class_metrics_df.copy())
+    classes_df = add_block_information(classes_df, blocks_map_path)
+    classes_df['turma_regular'] = classes_df['turnos_distintos'].apply(len) == 1
+    classes_df[CLASS_ID_COL] = hash_rows(classes_df, GRADE_KEY_COLS)
+
+    appearance_order = pd.unique(hash_rows(processed_df, GRADE_KEY_COLS))
+    # Indice montado direto dos hashes: set_index testa se a coluna forma um intervalo e a subtracao estoura em int64
+    class_ids = pd.Index(classes_df.pop(CLASS_ID_COL).to_numpy(dtype=np.int64), name=CLASS_ID_COL)
+    classes_df = classes_df.set_axis(class_ids).reindex(appearance_order).reset_index()
+    classes_df[CLASS_SCHEDULE_COL] = class_schedules(processed_df).reindex(classes_df[CLASS_ID_COL]).to_numpy()
+    return classes_df[CLASS_TABLE_COLS]
+
+def class_schedules(processed_df: pd.DataFrame) -> pd.Series:
+    """Horarios legiveis de cada turma ('Terça-feira 19:00:00-20:40:00; ...'), indexados pelo 'id_turma'."""
+    slots = pd.DataFrame({
+        CLASS_ID_COL: hash_rows(processed_df, GRADE_KEY_COLS),
+        'dia': parse_column(processed_df['Dia da Semana'], 'dia'),
+        'inicio': processed_df['Horario-Inicio-Segundos'].to_numpy(),
+        'texto': (processed_df['Dia da Semana'].astype(str) + ' ' + processed_df['Horário Início'].astype(str) + '-'
+                  + processed_df['Horário Fim'].astype(str)).to_numpy(),
+    }).drop_duplicates(subset=[CLASS_ID_COL, 'texto']).sort_values(['dia', 'inicio', 'texto'])
+    return slots.groupby(CLASS_ID_COL, sort=False)['texto'].agg('; '.join)
+
+def save_normalized_tables(processed_df: pd.DataFrame, class_table: pd.DataFrame, original_header: List[str],
+                           class_table_path: Path, enrollment_table_path: Path):
+    """Grava a tabela de turmas e a de matriculas, que referencia as turmas por 'id_turma'."""
+    class_table.to_csv(class_table_path, index=False, encoding='utf-8', float_format='%.2f')
+    logging.info(f"Tabela de turmas salva em: {class_table_path}")
+
+    build_enrollment_table(processed_df, original_header).to_csv(enrollment_table_path, index=False, encoding='utf-8')
+    logging.info(f"Tabela de matrículas salva em: {enrollment_table_path}")
+
+# Colunas que a tabela de turmas ja guarda: a disciplina e o semestre pelo 'id_turma' e os encontros em 'horarios'
+CLASS_TABLE_HELD_COLS = ['Disciplina', 'Ano/Semestre Disciplina', 'Dia da Semana', 'Horário Início', 'Horário Fim']
+
+def build_enrollment_table(processed_df: pd.DataFrame, original_header: List[str]) -> pd.DataFrame:
+    """Uma linha por aluno e turma ('id_turma'), so com as colunas originais que a tabela de turmas nao guarda.
+
+    Os encontros semanais da turma ficam em 'horarios' da tabela de turmas; se a nota, a frequencia ou a
+    situacao mudam entre os encontros de um aluno, cada valor distinto fica em uma linha.
+    """
+    enrollments_df = processed_df[[col for col in original_header if col not in CLASS_TABLE_HELD_COLS]].copy()
+    enrollments_df[CLASS_ID_COL] = hash_rows(processed_df, GRADE_KEY_COLS)
+    return drop_duplicate_rows(enrollments_df, enrollments_df.columns.tolist())
+
+DATABASE_INDEXES = {
+    'turmas': ['Ano/Semestre Disciplina', 'Disciplina', 'bloco', 'turno_predominante', CLASS_ID_COL],
+    'matriculas': ['RGA', CLASS_ID_COL],
+}
+
+def save_database(class_table: pd.DataFrame, enrollments_df: pd.DataFrame, database_path: Path):
+    """Grava as tabelas 'turmas' e 'matriculas' em um arquivo SQLite indexado, consultado por graphs/queries.py.
+
+    As metricas ficam sem arredondamento e o rowid das turmas segue a ordem em que aparecem no arquivo.
+    O banco e montado em um arquivo temporario e trocado de uma vez, para nao expor um banco pela metade.
+    """
+    database_path = Path(database_path)
+    temp_path = database_path.with_name(f"{database_path.name}.{os.getpid()}.tmp")
+    temp_path.unlink(missing_ok=True)
     try:
-        raw_df = load_data_csv(input_path)
-        original_header = raw_df.columns.tolist()
+        with closing(sqlite3.connect(temp_path)) as connection:
+            for table, df in (('turmas', class_table), ('matriculas', enrollments_df)):
+                df.to_sql(table, connection, index=False)
+                for col in DATABASE_INDEXES[table]:
+                    connection.execute(f'CREATE INDEX "{table}_{col}" ON {table} ("{col}")')
+            connection.commit()
+        temp_path.replace(database_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    logging.info(f"Banco de dados com {len(class_table)} turmas e {len(enrollments_df)} matrículas salvo em: {database_path}")
+
+FAILED_BY_ABSENCE_STATUS = 'RF'
+# Como em trash/catalogo.txt: desistente e o reprovado por falta que quase nao frequentou (no catalogo antigo
+# os desistentes tem de 72,5% a 100% de faltas e os reprovados no maximo ~52%), tenha ou nao nota
+DROPOUT_MAX_ATTENDANCE = 30.0
+# Sufixos dos grupos de desfecho no catalogo: aprovados, reprovados e desistentes
+CATALOG_OUTCOMES = ['a', 'r', 'd']
+CATALOG_CODE_COLS = {'disciplina': 'Disciplina', 'curso': 'Curso', 'entrada': 'Ano/Semestre Ingresso'}
+CATALOG_COLS = ['ID', 'disciplina', 'horario', 'carga', 'turma', 'curso', 'turno', 'semestre', 'entrada',
+                'num.t', 'num.a', 'num.r', 'num.d', 'media.t', 'media.a', 'media.r', 'media.d',
+                'media.freq.t', 'media.freq.a', 'media.freq.r', 'media.freq.d']
+CATALOG_DECIMALS = {'horario': 2, 'num.t': 2, 'num.a': 2, 'num.r': 2, 'num.d': 2,
+                    **{col: 1 for col in CATALOG_COLS if col.startswith('media.')}}
+
+def mean_by_code(codes: np.ndarray, values: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Quantidade de valores nao nulos e media de cada codigo; codigos sem valores ficam com media NaN."""
+    has_value = ~np.isnan(values)
+    count = np.bincount(codes, weights=has_value, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return count, np.bincount(codes, weights=np.where(has_value, values, 0.0), minlength=size) / count
+
+def mode_per_class(class_codes: np.ndarray, values: pd.Series, size: int) -> tuple[np.ndarray, pd.Index]:
+    """Codigo (a partir de 1, na ordem dos valores) do valor mais frequente de cada turma, ou 0 se nao houver valores.
+
+    Empates ficam com o menor valor.
+    """
+    value_codes, uniques = pd.factorize(values, sort=True)
+    valid = value_codes >= 0
+    pairs, counts = np.unique(class_codes[valid] * len(uniques) + value_codes[valid], return_counts=True)
+    pair_classes = pairs // max(len(uniques), 1)
+    order = np.lexsort((-counts, pair_classes))
+    first = order[np.r_[True, pair_classes[order][1:] != pair_classes[order][:-1]]] if len(order) else order
+
+    mode = np.zeros(size, dtype=np.int64)
+    mode[pair_classes[first]] = pairs[first] % len(uniques) + 1
+    return mode, pd.Index(uniques)
+
+def build_class_catalog(processed_df: pd.DataFrame, class_metrics_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Tabela de modelagem no formato de trash/catalogo.txt (uma linha por turma) e a legenda dos seus codigos.
+
+    Cada aluno conta uma vez por turma e cai em um unico desfecho: aprovado ('AP'), desistente
+    (reprovado por falta com ate DROPOUT_MAX_ATTENDANCE% de frequencia) ou reprovado. 'media.freq.*'
+    e o percentual de faltas (100 - '% Frequência') e 'turma' e um codigo cuja legenda da o 'id_turma'
+    da tabela de turmas.
+    Contagens e medias de todos os desfechos saem de bincounts sobre o codigo turma * 3 + desfecho.
+    """
+    class_codes, _ = factorize_class_keys(processed_df)
+    rows = class_codes >= 0
+    codes = class_codes[rows]
+    df = processed_df[rows]
+    n_classes = len(class_metrics_df)
+    n_outcomes = len(CATALOG_OUTCOMES)
+
+    # As linhas de um aluno (uma por encontro semanal) repetem desfecho, nota e frequencia
+    student_codes, student_keys = pd.factorize(hash_rows(df, KEY_COLS))
+    _, first_rows = np.unique(student_codes, return_index=True)
+    _, student_grade = mean_by_code(student_codes, df['Media-Final-Float'].to_numpy(dtype=float), len(student_keys))
+    _, student_frequency = mean_by_code(student_codes, df['Frequencia-Float'].to_numpy(dtype=float), len(student_keys))
+    student_absence = 100.0 - student_frequency
+
+    approved = (df[FINAL_SITUATION_COL] == APPROVED_STATUS).to_numpy(dtype=bool)[first_rows]
+    dropped = (df[FINAL_SITUATION_COL] == FAILED_BY_ABSENCE_STATUS).to_numpy(dtype=bool)[first_rows] & (student_frequency <= DROPOUT_MAX_ATTENDANCE)
+    outcomes = np.where(approved, 0, np.where(dropped, 2, 1))
+
+    groups = codes[first_rows] * n_outcomes + outcomes
+    size = n_classes * n_outcomes
+    counts = np.bincount(groups, minlength=size).reshape(n_classes, n_outcomes)
+    grade_n, grade_mean = mean_by_code(groups, student_grade, size)
+    absence_n, absence_mean = mean_by_code(groups, student_absence, size)
+
+    classes_df = calculate_derived_metrics(class_metrics_df.copy())
+    catalog = pd.DataFrame({
+        'horario': classes_df['peso_final'].to_numpy(dtype=float),
+        'carga': classes_df['carga_semanal_dias'].to_numpy(),
+        'turno': pd.Categorical(classes_df['turno_predominante'], categories=[*SHIFTS, 'MISTO']).codes + 1,
+        'semestre': pd.array(parse_column(classes_df['Ano/Semestre Disciplina'], 'semestre') % 2 + 1, dtype='Int64'),
+    })
+
+    legends = [pd.DataFrame({'coluna': 'turno', 'codigo': np.arange(1, len(SHIFTS) + 2), 'valor': [*SHIFTS, 'MISTO']})]
+    # Codigos na ordem dos id_turma: nao mudam com a ordem das linhas do arquivo, ao contrario de 'ID'
+    class_ids, values = pd.factorize(hash_rows(classes_df, GRADE_KEY_COLS), sort=True)
+    catalog['turma'] = class_ids + 1
+    legends.append(pd.DataFrame({'coluna': 'turma', 'codigo': np.arange(1, len(values) + 1), 'valor': np.asarray(values, dtype=object)}))
+    student_classes = codes[first_rows]
+    for col, source_col in CATALOG_CODE_COLS.items():
+        if source_col == 'Disciplina':
+            class_values, values = pd.factorize(classes_df[source_col], sort=True)
+            catalog[col] = class_values + 1
+        else:
+            catalog[col], values = mode_per_class(student_classes, df[source_col].iloc[first_rows], n_classes)
+        legends.append(pd.DataFrame({'coluna': col, 'codigo': np.arange(1, len(values) + 1), 'valor': np.asarray(values, dtype=object)}))
+
+    total = counts.sum(axis=1)
+    catalog['num.t'] = total.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i, outcome in enumerate(CATALOG_OUTCOMES):
+            catalog[f'num.{outcome}'] = counts[:, i] / total
+        for name, n, mean in (('media', grade_n, grade_mean), ('media.freq', absence_n, absence_mean)):
+            n, mean = n.reshape(n_classes, n_outcomes), mean.reshape(n_classes, n_outcomes)
+            catalog[f'{name}.t'] = np.nansum(n * np.nan_to_num(mean), axis=1) / n.sum(axis=1)
+            for i, outcome in enumerate(CATALOG_OUTCOMES):
+                catalog[f'{name}.{outcome}'] = mean[:, i]
+
+    # Turmas na ordem em que aparecem no arquivo, numeradas a partir de 1
+    catalog = catalog.iloc[pd.unique(codes)].reset_index(drop=True)
+    catalog['ID'] = np.arange(1, len(catalog) + 1)
+    return catalog[CATALOG_COLS], pd.concat(legends, ignore_index=True)
+
+def save_class_catalog(catalog: pd.DataFrame, legend: pd.DataFrame, catalog_path: Path):
+    """Grava o catalogo separado por tabulacoes, com 'NaN' nos grupos sem alunos, e a legenda ao lado."""
+    formatted = {col: format_decimals(catalog[col], decimals).where(catalog[col].notna(), 'NaN')
+                 for col, decimals in CATALOG_DECIMALS.items()}
+    catalog.assign(**formatted).to_csv(catalog_path, sep='\t', index=False, encoding='utf-8')
+    legend_path = catalog_path.with_name(f"{catalog_path.stem}_legenda.csv")
+    legend.to_csv(legend_path, index=False, encoding='utf-8')
+    logging.info(f"Catálogo de {len(catalog)} turmas salvo em: {catalog_path} (legenda dos códigos em: {legend_path})")
+
+STUDENT_TERM_COLS = ['RGA', 'Ano/Semestre Disciplina']
+DAY_SECONDS = 24 * 3600
+LATE_NIGHT_END = time(22, 0, 0)
+EARLY_MORNING_START = time(8, 0, 0)
+TIMETABLE_COLS = ['aluno_semestre', 'dia', 'inicio', 'fim', 'horas_aula', 'inicio_dia_seguinte', 'intervalo_noturno', 'noite_manha']
+SLEEP_FEATURE_COLS = ['dias_com_aula', 'fim_mais_tarde', 'inicio_mais_cedo', 'menor_intervalo_noturno', 'intervalo_noturno_medio',
+                      'transicoes_noite_manha', 'horas_aula_dia_media', 'horas_aula_dia_max']
+
+def build_weekly_timetables(df: pd.DataFrame) -> pd.DataFrame:
+    """Grade semanal de cada aluno no semestre, com todas as disciplinas juntas: uma linha por dia com aula.
+
+    Os encontros sao ordenados por (aluno/semestre, dia, inicio) e varridos uma vez: o maximo acumulado dos
+    fins dentro de cada dia da as horas de aula sem contar sobreposicoes duas vezes, e o primeiro inicio do
+    dia seguinte (domingo volta para segunda) e achado por busca binaria. Horarios em segundos desde a meia-noite.
+    """
+    keys = df[STUDENT_TERM_COLS]
+    days = np.nan_to_num(parse_column(df['Dia da Semana'], 'dia'), nan=-1).astype(np.int64)
+    starts = df['Horario-Inicio-Segundos'].to_numpy(dtype=float)
+    ends = parse_column(df['Horário Fim'], 'hora')
+    valid = keys.notna().all(axis=1).to_numpy() & (days >= 0) & (ends > starts)
+    if not valid.any():
+        return pd.DataFrame(columns=STUDENT_TERM_COLS + TIMETABLE_COLS)
+
+    term_codes, terms = pd.MultiIndex.from_frame(keys[valid]).factorize()
+    days, starts, ends = days[valid], starts[valid], ends[valid]
+    order = np.lexsort((starts, days, term_codes))
+    term_codes, days, starts, ends = term_codes[order], days[order], starts[order], ends[order]
+
+    day_keys = term_codes * len(WEEKDAYS) + days
+    new_day = np.r_[True, day_keys[1:] != day_keys[:-1]]
+    day_rows = np.flatnonzero(new_day)
+    day_numbers = np.cumsum(new_day) - 1
+
+    # Fim mais tarde ja coberto antes de cada encontro do mesmo dia; o deslocamento por dia isola os maximos acumulados
+    offset = day_numbers * 2.0 * DAY_SECONDS
+    covered_until = np.maximum.accumulate(ends + offset) - offset
+    previous_end = np.r_[-np.inf, covered_until[:-1]]
+    previous_end[new_day] = -np.inf
+    class_seconds = np.maximum(ends - np.maximum(starts, previous_end), 0.0)
+
+    timetable = terms.take(term_codes[day_rows]).to_frame(index=False, name=STUDENT_TERM_COLS)
+    timetable['aluno_semestre'] = term_codes[day_rows]
+    timetable['dia'] = days[day_rows]
+    timetable['inicio'] = starts[day_rows]
+    timetable['fim'] = np.maximum.reduceat(ends, day_rows)
+    timetable['horas_aula'] = np.add.reduceat(class_seconds, day_rows) / 3600
+
+    unique_day_keys = day_keys[day_rows]
+    next_keys = term_codes[day_rows] * len(WEEKDAYS) + (days[day_rows] + 1) % len(WEEKDAYS)
+    positions = np.minimum(np.searchsorted(unique_day_keys, next_keys), len(day_rows) - 1)
+    next_start = np.where(unique_day_keys[positions] == next_keys, starts[day_rows][positions], np.nan)
+    timetable['inicio_dia_seguinte'] = next_start
+    timetable['intervalo_noturno'] = (DAY_SECONDS - timetable['fim'] + next_start) / 3600
+    timetable['noite_manha'] = ((timetable['fim'] >= time_to_seconds(LATE_NIGHT_END)) &
+                                (next_start <= time_to_seconds(EARLY_MORNING_START)))
+    return timetable
+
+def sleep_window_features(timetable: pd.DataFrame) -> pd.DataFrame:
+    """Resume a grade semanal por aluno e semestre; horarios em horas desde a meia-noite e intervalos em horas.
+
+    O intervalo noturno so existe entre dois dias seguidos com aula; sem nenhum par desses ele fica NaN.
+    """
+    if timetable.empty:
+        return pd.DataFrame(columns=STUDENT_TERM_COLS + SLEEP_FEATURE_COLS)
+    codes = timetable['aluno_semestre'].to_numpy()
+    term_rows = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    features = timetable[STUDENT_TERM_COLS].iloc[term_rows].reset_index(drop=True)
+
+    gaps = timetable['intervalo_noturno'].to_numpy()
+    class_hours = timetable['horas_aula'].to_numpy()
+    n_days = np.diff(np.r_[term_rows, len(codes)])
+    n_gaps = np.add.reduceat(~np.isnan(gaps), term_rows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features['dias_com_aula'] = n_days
+        features['fim_mais_tarde'] = np.maximum.reduceat(timetable['fim'].to_numpy(), term_rows) / 3600
+        features['inicio_mais_cedo'] = np.minimum.reduceat(timetable['inicio'].to_numpy(), term_rows) / 3600
+        features['menor_intervalo_noturno'] = np.fmin.reduceat(gaps, term_rows)
+        features['intervalo_noturno_medio'] = np.add.reduceat(np.nan_to_num(gaps), term_rows) / n_gaps
+        features['transicoes_noite_manha'] = np.add.reduceat(timetable['noite_manha'].to_numpy(dtype=np.int64), term_rows)
+        features['horas_aula_dia_media'] = np.add.reduceat(class_hours, term_rows) / n_days
+        features['horas_aula_dia_max'] = np.maximum.reduceat(class_hours, term_rows)
+    return features
+
+def add_sleep_features(processed_df: pd.DataFrame, original_header: List[str]) -> pd.DataFrame:
+    """Uma linha por matricula (aluno, disciplina e semestre) com os indicadores de sono do aluno naquele semestre."""
+    features = sleep_window_features(build_weekly_timetables(processed_df))
+    enrollment_cols = [col for col in original_header if col not in SCHEDULE_SLOT_COLS + ['Horário Fim']]
+    is_first = ~pd.Series(hash_rows(processed_df, KEY_COLS)).duplicated().to_numpy()
+    enrollments_df = processed_df.loc[is_first, enrollment_cols]
+    return enrollments_df.merge(features, on=STUDENT_TERM_COLS, how='left')
+
+def save_sleep_features(enrollments_df: pd.DataFrame, output_path: Path):
+    enrollments_df.to_csv(output_path, index=False, encoding='utf-8', float_format='%.2f')
+    logging.info(f"Indicadores de sono de {len(enrollments_df)} matrículas salvos em: {output_path}")
+
+def write_columnar_artifact(df: pd.DataFrame, columns_to_keep: List[str], output_path: Path, input_hash: str, report_path: Path):
+    """Grava o relatorio com os tipos preservados (Parquet) para os scripts de graficos.
+
+    Os numeros ficam numericos e as colunas repetitivas viram categoricas. Os metadados guardam o hash
+    de todas as entradas e o do relatorio CSV correspondente, que columnar.load_columnar_if_fresh confere.
+    """
+    final_columns = [col for col in columns_to_keep if col in df.columns]
+    output_df = df[final_columns].copy()
+
+    for col in CATEGORICAL_OUTPUT_COLS:
+        if col in output_df.columns:
+            output_df[col] = output_df[col].astype('category')
+    output_df.attrs[INPUT_HASH_KEY] = input_hash
+    output_df.attrs[REPORT_HASH_KEY] = hash_input_files(report_path)
+
+    try:
+        output_df.to_parquet(output_path, index=False)
+    except ImportError:
+        logging.warning("pyarrow nao instalado: artefato colunar nao sera gerado.")
+        return
+    logging.info(f"Artefato colunar salvo em: {output_path}")
+
+def output_columns(original_header: List[str]) -> tuple[List[str], List[str]]:
+    base_metrics = ["bloco", "total_alunos_disciplina", "carga_semanal_dias", "media_disciplina", 
+                    "desvio_padrao", "taxa_aprovacao", "taxa_reprovacao"]
+
+    regular_cols = original_header + ["turno_predominante", "peso_final"] + base_metrics
+    irregular_cols = original_header + base_metrics
+    return regular_cols, irregular_cols
+
+def mark_unseen(hashes: np.ndarray, seen: set) -> np.ndarray:
+    """Marca as hashes que nao apareceram em lotes anteriores nem antes no proprio lote e as inclui em 'seen'.
+
+    'seen' e um conjunto, entao consultar e incluir custam o mesmo qualquer que seja o numero de hashes ja vistas.
+    """
+    is_new = ~pd.Series(hashes).duplicated().to_numpy()
+    candidates = np.flatnonzero(is_new)
+    is_new[candidates] = np.fromiter((h not in seen for h in hashes[candidates].tolist()), dtype=bool, count=len(candidates))
+    seen.update(hashes[is_new].tolist())
+    return is_new
+
+GRADE_MOMENT_COLS = ['notas_n', 'notas_media', 'notas_m2']
+ENROLLMENT_ACCUMULATORS = {
+    'Disciplina': np.int64,
+    'Ano/Semestre Disciplina': np.int64,
+    'tem_rga': bool,
+    'total_linhas': np.int64,
+    'total_aprovados': np.int64,
+    'turnos': np.int64,
+    'notas_n': float,
+    'notas_media': float,
+    'notas_m2': float,
+}
+SLOT_WORD_BITS = 64
+NO_ROW = np.iinfo(np.int64).max
+
+def shift_labels() -> List[str]:
+    return list(SHIFTS) + [SHIFT_UNDEFINED]
+
+def vocabulary_codes(vocabulary: dict, values: np.ndarray) -> np.ndarray:
+    """Codigo de cada valor em um vocabulario {valor: codigo} que cresce com os valores novos (nulos viram None)."""
+    value_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+    uniques[pd.isna(uniques)] = None
+    codes = np.array([vocabulary.setdefault(value, len(vocabulary)) for value in uniques.tolist()], dtype=np.int64)
+    return codes[value_codes]
+
+def grown(array: np.ndarray, rows: int, cols: int = 0, fill=0) -> np.ndarray:
+    """O acumulador com pelo menos 'rows' linhas (a capacidade dobra) e 'cols' colunas; o espaco novo recebe 'fill'."""
+    capacity = array.shape[0] if rows <= array.shape[0] else max(rows, 2 * array.shape[0])
+    shape = (capacity,) + tuple(max(cols, size) for size in array.shape[1:])
+    if shape == array.shape:
+        return array
+    result = np.full(shape, fill, dtype=array.dtype)
+    result[tuple(slice(0, size) for size in array.shape)] = array
+    return result
+
+def enrollment_partials(df: pd.DataFrame, first_row: int) -> dict:
+    """Agregados de um lote (ou arquivo) por matricula (RGA, Disciplina, semestre), do tamanho do numero de matriculas.
+
+    Alem das somas e dos momentos das notas, traz os horarios distintos de cada matricula e a primeira
+    linha (com o peso) de cada dia, o suficiente para fold_enrollment_partials nao rever as linhas.
+    """
+    codes, enrollments = pd.factorize(hash_rows(df, KEY_COLS))
+    n = len(enrollments)
+    _, first_rows = np.unique(codes, return_index=True)
+
+    grades = df['Media-Final-Float'].to_numpy(dtype=float)
+    moments = combine_moments(codes, ~np.isnan(grades), grades, np.zeros(len(grades)), n)
+
+    shifts = df['Turno'].to_numpy()
+    shift_masks = np.zeros(n, dtype=np.int64)
+    for bit, label in enumerate(shift_labels()):
+        shift_masks |= (np.bincount(codes, weights=shifts == label, minlength=n) > 0).astype(np.int64) << bit
+
+    slot_hashes = schedule_slot_hashes(df)
+    slot_rows = np.flatnonzero(~pd.DataFrame({'matricula': codes, 'horario': slot_hashes}).duplicated().to_numpy())
+    day_enrollments, day_rows = distinct_per_class(codes, df['Dia da Semana'])
+
+    partials = {
+        'matricula': np.asarray(enrollments),
+        'Disciplina': df['Disciplina'].to_numpy()[first_rows],
+        'Ano/Semestre Disciplina': df['Ano/Semestre Disciplina'].to_numpy()[first_rows],
+        'tem_rga': df['RGA'].notna().to_numpy()[first_rows],
+        'total_linhas': np.bincount(codes, minlength=n),
+        'total_aprovados': np.bincount(codes, weights=(df[FINAL_SITUATION_COL] == APPROVED_STATUS).to_numpy(dtype=float),
+                                       minlength=n).astype(np.int64),
+        'turnos': shift_masks,
+        'horario_matricula': codes[slot_rows],
+        'horario': slot_hashes[slot_rows],
+        'dia_matricula': day_enrollments,
+        'dia': df['Dia da Semana'].to_numpy()[day_rows],
+        'dia_linha': first_row + day_rows,
+        'dia_peso': df['Peso-Horario'].to_numpy()[day_rows],
+    }
+    partials.update(zip(GRADE_MOMENT_COLS, moments))
+    return partials
+
+def new_enrollment_state() -> dict:
+    """Estado da primeira passada: vocabularios {valor: codigo} e acumuladores com uma linha por matricula.
+
+    Os horarios de cada matricula sao bits (um por horario distinto do vocabulario) e, de cada dia,
+    ficam so a primeira linha e o seu peso; nada cresce com o numero de linhas lidas.
+    """
+    return {
+        'vocabularios': {name: {} for name in ['matricula', 'Disciplina', 'Ano/Semestre Disciplina', 'horario', 'dia']},
+        'acumuladores': {name: np.zeros(0, dtype=dtype) for name, dtype in ENROLLMENT_ACCUMULATORS.items()},
+        'horarios': np.zeros((0, 1), dtype=np.uint64),
+        'dia_linha': np.zeros((0, 0), dtype=np.int64),
+        'dia_peso': np.zeros((0, 0), dtype=np.int64),
+    }
+
+def fold_enrollment_partials(state: dict, partials: dict):
+    """Junta os agregados de um lote aos acumuladores, em tempo proporcional ao tamanho do lote."""
+    vocabularies, accumulators = state['vocabularios'], state['acumuladores']
+    n_before = len(vocabularies['matricula'])
+    codes = vocabulary_codes(vocabularies['matricula'], partials['matricula'])
+    n = len(vocabularies['matricula'])
+    for name, values in accumulators.items():
+        accumulators[name] = grown(values, n)
+
+    is_new = codes >= n_before
+    for col in ['Disciplina', 'Ano/Semestre Disciplina']:
+        accumulators[col][codes[is_new]] = vocabulary_codes(vocabularies[col], partials[col][is_new])
+    accumulators['tem_rga'][codes[is_new]] = partials['tem_rga'][is_new]
+    accumulators['total_linhas'][codes] += partials['total_linhas']
+    accumulators['total_aprovados'][codes] += partials['total_aprovados']
+    accumulators['turnos'][codes] |= partials['turnos']
+
+    # As matriculas de um lote sao distintas: cada uma junta dois momentos, o acumulado e o do lote
+    pairs = np.tile(np.arange(len(codes)), 2)
+    moments = combine_moments(pairs, *(np.concatenate([accumulators[col][codes], partials[col]]) for col in GRADE_MOMENT_COLS), len(codes))
+    for col, values in zip(GRADE_MOMENT_COLS, moments):
+        accumulators[col][codes] = values
+
+    words, bits = np.divmod(vocabulary_codes(vocabularies['horario'], partials['horario']), SLOT_WORD_BITS)
+    state['horarios'] = grown(state['horarios'], n, words.max(initial=0) + 1)
+    np.bitwise_or.at(state['horarios'], (codes[partials['horario_matricula']], words), np.left_shift(np.uint64(1), bits.astype(np.uint64)))
+
+    days = vocabulary_codes(vocabularies['dia'], partials['dia'])
+    state['dia_linha'] = grown(state['dia_linha'], n, len(vocabularies['dia']), fill=NO_ROW)
+    state['dia_peso'] = grown(state['dia_peso'], n, len(vocabularies['dia']))
+    cells = (codes[partials['dia_matricula']], days)
+    is_first = partials['dia_linha'] < state['dia_linha'][cells]
+    cells = (cells[0][is_first], cells[1][is_first])
+    state['dia_linha'][cells] = partials['dia_linha'][is_first]
+    state['dia_peso'][cells] = partials['dia_peso'][is_first]
+
+def finalize_class_metrics(state: dict) -> tuple[pd.DataFrame, pd.Series]:
+    """Monta, a partir dos acumuladores por matricula, a mesma tabela de aggregate_class_metrics.
+
+    Devolve tambem o fingerprint da grade de cada matricula, indexado pela hash da matricula.
+    """
+    vocabularies = state['vocabularios']
+    n = len(vocabularies['matricula'])
+    accumulators = {name: values[:n] for name, values in state['acumuladores'].items()}
+
+    schedule_sum = np.zeros(n, dtype=np.int64)
+    slot_words = state['horarios'][:n]
+    for slot, slot_hash in enumerate(vocabularies['horario']):
+        word, bit = divmod(slot, SLOT_WORD_BITS)
+        has_slot = (slot_words[:, word] >> np.uint64(bit) & np.uint64(1)).astype(bool)
+        schedule_sum += np.where(has_slot, np.int64(slot_hash), np.int64(0))
+    fingerprints = finalize_schedule_fingerprint(schedule_sum)
+
+    enrollments = pd.DataFrame({col: np.array(list(vocabularies[col]), dtype=object)[accumulators[col]]
+                                for col in ['Disciplina', 'Ano/Semestre Disciplina']})
+    enrollments['grade_horarios_aluno'] = fingerprints
+    class_codes, classes_df = factorize_class_keys(enrollments)
+    n_classes = len(classes_df)
+
+    has_key = class_codes >= 0
+    codes = class_codes[has_key]
+    accumulators = {name: values[has_key] for name, values in accumulators.items()}
+
+    total_rows = np.bincount(codes, weights=accumulators['total_linhas'], minlength=n_classes)
+    approved = np.bincount(codes, weights=accumulators['total_aprovados'], minlength=n_classes)
+
+    shift_masks = np.zeros(n_classes, dtype=np.int64)
+    for bit in range(len(shift_labels())):
+        shift_masks |= (np.bincount(codes, weights=accumulators['turnos'] >> bit & 1, minlength=n_classes) > 0).astype(np.int64) << bit
+    shift_sets = {mask: frozenset(label for bit, label in enumerate(shift_labels()) if mask >> bit & 1)
+                  for mask in np.unique(shift_masks)}
+
+    # Dia de cada turma: o da primeira linha do arquivo entre as suas matriculas, como em distinct_per_class
+    day_rows = state['dia_linha'][:n][has_key]
+    day_enrollments, days = np.nonzero(day_rows != NO_ROW)
+    order = np.argsort(day_rows[day_enrollments, days], kind='stable')
+    _, first = np.unique((codes[day_enrollments] * (day_rows.shape[1] + 1) + days)[order], return_index=True)
+    day_enrollments, days = day_enrollments[order[first]], days[order[first]]
+    day_classes = codes[day_enrollments]
+    day_classes_not_null = day_classes[days != vocabularies['dia'].get(None, -1)]
+    weights = state['dia_peso'][:n][has_key][day_enrollments, days]
+
+    grade_n, grade_mean, grade_m2 = class_grade_moments(codes, accumulators['notas_n'], accumulators['notas_media'], n_classes)
+
+    classes_df['total_alunos_disciplina'] = np.bincount(codes, weights=accumulators['tem_rga'], minlength=n_classes).astype(np.int64)
+    classes_df['carga_semanal_dias'] = np.bincount(day_classes_not_null, minlength=n_classes)
+    classes_df['turnos_distintos'] = [shift_sets[mask] for mask in shift_masks]
+    classes_df['media_disciplina'] = grade_mean
+    classes_df['desvio_padrao'] = sample_std(grade_n, grade_m2)
+    classes_df['soma_pesos_horario'] = np.bincount(day_classes, weights=weights, minlength=n_classes).astype(weights.dtype)
+    classes_df['taxa_aprovacao'] = approved / total_rows
+    classes_df['taxa_reprovacao'] = 1 - classes_df['taxa_aprovacao']
+
+    enrollment_keys = np.fromiter(vocabularies['matricula'], dtype=np.int64, count=n)
+    return classes_df, pd.Series(fingerprints, index=enrollment_keys, name='grade_horarios_aluno')
+
+def append_csv(df: pd.DataFrame, columns_to_keep: List[str], output_path: Path, first_chunk: bool):
+    """Versao incremental de prepare_and_save_csv: anexa as linhas (ja sem repeticoes) ao arquivo."""
+    final_columns = [col for col in columns_to_keep if col in df.columns]
+
+    format_for_output(df[final_columns]).to_csv(output_path, index=False, encoding='utf-8',
+                                                mode='w' if first_chunk else 'a', header=first_chunk)
+
+def append_report_chunk(final_df: pd.DataFrame, header: List[str], regular_output_path: Path, irregular_output_path: Path, first_chunk: bool):
+    regular_df, irregular_df = separate_regular_and_irregular_classes(final_df)
+    regular_cols, irregular_cols = output_columns(header)
+
+    append_csv(regular_df, regular_cols, regular_output_path, first_chunk)
+    append_csv(irregular_df, irregular_cols, irregular_output_path, first_chunk)
+
+def split_by_semester(input_path: Path, chunksize: int, partition_dir: Path) -> Dict[str, Path]:
+    """Copia, lendo em lotes, as linhas de cada semestre para um arquivo proprio, na ordem do arquivo de entrada.
+
+    As linhas sao lidas e gravadas como texto, entao cada particao reproduz exatamente as linhas originais.
+    """
+    partitions = {}
+    for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=str, keep_default_na=False, encoding='utf-8'):
+        for semester, rows in chunk.groupby(SEMESTER_COL, sort=False).indices.items():
+            is_new = semester not in partitions
+            if is_new:
+                partitions[semester] = partition_dir / f"{len(partitions)}.csv"
+            chunk.iloc[rows].to_csv(partitions[semester], mode='w' if is_new else 'a', header=is_new, index=False, encoding='utf-8')
+    return partitions
+
+def run_streaming_analysis_pipeline(input_path: Path, regular_output_path: Path, irregular_output_path: Path, blocks_map_path: Path, chunksize: int):
+    """Executa o pipeline sem carregar o arquivo inteiro.
+
+    Uma turma nunca mistura semestres, entao a primeira leitura (em lotes) separa as linhas por semestre
+    em arquivos temporarios e cada semestre e processado em memoria, como no modo normal, e anexado aos
+    relatorios. O pico de memoria e o do maior semestre, nao o do arquivo.
+    """
+    logging.info(f"Modo em lotes: lendo '{input_path}' em blocos de {chunksize} registros...")
+
+    with tempfile.TemporaryDirectory(prefix='semestres-') as partition_dir:
+        partitions = split_by_semester(input_path, chunksize, Path(partition_dir))
+        logging.info(f"Primeira leitura concluída: {len(partitions)} semestres.")
+
+        for i, partition in enumerate(partitions.values()):
+            raw_df = load_data_csv(partition)
+            header = raw_df.columns.tolist()
+            processed_df = preprocess_data(raw_df)
+
+            final_df = enrich_rows(drop_duplicate_rows(processed_df, header), aggregate_class_metrics(processed_df), blocks_map_path)
+            append_report_chunk(final_df, header, regular_output_path, irregular_output_path, first_chunk=i == 0)
+
+    logging.info(f"Relatórios salvos em: {regular_output_path} e {irregular_output_path}")
+
+FILE_ROW_BITS = 40
+
+def resolve_input_paths(input_path: Union[Path, str, List[Path]]) -> List[Path]:
+    """Aceita um arquivo, uma lista de arquivos ou um padrao glob (ex.: 'include/[A-Z]*.csv')."""
+    if isinstance(input_path, (list, tuple)):
+        return [path for item in input_path for path in resolve_input_paths(item)]
+    if glob.has_magic(str(input_path)):
+        return [Path(path) for path in sorted(glob.glob(str(input_path)))]
+    return [Path(input_path)]
+
+def aggregate_course_file(input_path: Path, file_index: int) -> tuple[dict, List[str], np.ndarray]:
+    """Primeira passada de um arquivo de curso, executada em um processo separado.
+
+    Devolve os agregados por matricula, o cabecalho e a hash de cada linha, com a qual o processo
+    principal decide quais linhas repetidas entre arquivos ficam de fora dos relatorios.
+    """
+    chunk = load_data_csv(input_path)
+    header = chunk.columns.tolist()
+    processed = preprocess_rows(chunk)
+    return enrollment_partials(processed, file_index << FILE_ROW_BITS), header, hash_rows(processed, header)
+
+def report_course_file(input_path: Path, keep_rows: np.ndarray, class_metrics_df: pd.DataFrame, fingerprints: pd.Series,
+                       blocks_map_path: Path, part_paths: tuple[Path, Path]):
+    """Segunda passada de um arquivo de curso: enriquece as linhas mantidas e grava a parte do arquivo
+    em cada relatorio (regular e irregular), ja formatada e sem cabecalho."""
+    chunk = load_data_csv(input_path)
+    header = chunk.columns.tolist()
+    processed = preprocess_rows(chunk)[keep_rows].copy()
+    processed['grade_horarios_aluno'] = fingerprints.reindex(hash_rows(processed, KEY_COLS)).to_numpy()
+
+    reports = separate_regular_and_irregular_classes(enrich_rows(processed, class_metrics_df, blocks_map_path))
+    for df, columns, part_path in zip(reports, output_columns(header), part_paths):
+        final_columns = [col for col in columns if col in df.columns]
+        format_for_output(df[final_columns]).to_csv(part_path, index=False, header=False, encoding='utf-8')
+
+def run_multi_course_pipeline(input_paths: List[Path], regular_output_path: Path, irregular_output_path: Path, blocks_map_path: Path,
+                              max_workers: Optional[int] = None):
+    """Processa varios arquivos de curso em paralelo, um processo por arquivo.
+
+    Como uma mesma turma reune alunos de cursos diferentes, cada processo devolve agregados
+    parciais por matricula, que sao combinados antes de montar as metricas das turmas. Na segunda
+    passada cada processo grava a sua parte dos relatorios, que sao so concatenadas no final.
+    """
+    logging.info(f"Processando {len(input_paths)} arquivos de curso em paralelo...")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, tempfile.TemporaryDirectory(prefix='cursos-') as part_dir:
+        state = new_enrollment_state()
+        seen_rows = set()
+        headers, keep_rows = [], []
+        for partials, header, row_hashes in executor.map(aggregate_course_file, input_paths, range(len(input_paths))):
+            fold_enrollment_partials(state, partials)
+            headers.append(header)
+            keep_rows.append(mark_unseen(row_hashes, seen_rows))
+
+        class_metrics_df, fingerprints = finalize_class_metrics(state)
+        logging.info(f"Agregados combinados: {len(fingerprints)} matrículas em {len(class_metrics_df)} turmas.")
+
+        n = len(input_paths)
+        part_paths = [(Path(part_dir) / f"{i}.regulares.csv", Path(part_dir) / f"{i}.irregulares.csv") for i in range(n)]
+        list(executor.map(report_course_file, input_paths, keep_rows, [class_metrics_df] * n, [fingerprints] * n,
+                          [blocks_map_path] * n, part_paths))
+
+        regular_cols, irregular_cols = output_columns(headers[0])
+        concatenate_partitions(regular_cols, [regular for regular, _ in part_paths], regular_output_path)
+        concatenate_partitions(irregular_cols, [irregular for _, irregular in part_paths], irregular_output_path)
+
+    logging.info(f"Relatórios salvos em: {regular_output_path} e {irregular_output_path}")
+
+SEMESTER_COL = 'Ano/Semestre Disciplina'
+INCREMENTAL_MANIFEST = 'manifest.json'
+
+def pipeline_config_salt(blocks_map_path: Path) -> bytes:
+    """Tudo que, fora as linhas do semestre, muda o resultado de uma particao."""
+    config = repr((SHIFTS, TIME_WEIGHT, FINAL_SITUATION_COL, APPROVED_STATUS, BLOCK_INDEX_VERSION, REPORT_FORMAT_VERSION))
+    return config.encode('utf-8') + hash_input_files(blocks_map_path).encode('ascii')
+
+def semester_fingerprints(raw_df: pd.DataFrame, salt: bytes) -> tuple[dict, dict]:
+    """Hash das linhas (em ordem) de cada semestre, e as posicoes dessas linhas no arquivo."""
+    row_hashes = hash_rows(raw_df, raw_df.columns.tolist())
+    positions = raw_df.groupby(SEMESTER_COL, sort=False, observed=True).indices
+
+    fingerprints = {}
+    for semester, rows in positions.items():
+        fingerprints[semester] = hashlib.sha256(row_hashes[rows].tobytes() + salt).hexdigest()
+    return fingerprints, positions
+
+def partition_path(state_dir: Path, semester: str, kind: str) -> Path:
+    return state_dir / f"{semester.replace('/', '-')}.{kind}.csv"
+
+def load_incremental_manifest(state_dir: Path) -> dict:
+    manifest_path = state_dir / INCREMENTAL_MANIFEST
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, encoding='utf-8') as file:
+        return json.load(file)
+
+def concatenate_partitions(columns: List[str], partitions: List[Path], output_path: Path):
+    pd.DataFrame(columns=columns).to_csv(output_path, index=False, encoding='utf-8')
+    with open(output_path, 'ab') as output:
+        for partition in partitions:
+            with open(partition, 'rb') as file:
+                output.write(file.read())
+
+def run_incremental_analysis_pipeline(input_path: Path, regular_output_path: Path, irregular_output_path: Path, blocks_map_path: Path, state_dir: Path):
+    """Recalcula apenas os semestres cujas linhas mudaram desde a ultima execucao.
+
+    Todas as metricas de turma sao por semestre, entao cada semestre e uma particao independente:
+    as linhas ja formatadas de cada particao ficam em 'state_dir' e os relatorios sao remontados
+    concatenando as particoes, na ordem em que os semestres aparecem no arquivo.
+    """
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    raw_df = load_data_csv(input_path)
+    original_header = raw_df.columns.tolist()
+    regular_cols, irregular_cols = output_columns(original_header)
+
+    fingerprints, positions = semester_fingerprints(raw_df, pipeline_config_salt(blocks_map_path))
+    previous = load_incremental_manifest(state_dir)
+    previous_fingerprints = previous.get('semestres', {}) if previous.get('cabecalho') == original_header else {}
+
+    # Uma particao apagada do disco e refeita mesmo que o semestre nao tenha mudado
+    changed = [semester for semester, fingerprint in fingerprints.items()
+               if previous_fingerprints.get(semester) != fingerprint
+               or not all(partition_path(state_dir, semester, kind).exists() for kind in ('regulares', 'irregulares'))]
+    logging.info(f"{len(changed)} de {len(fingerprints)} semestres mudaram desde a última execução.")
+
+    if changed:
+        changed_rows = np.sort(np.concatenate([positions[semester] for semester in changed]))
+        processed_df = preprocess_data(raw_df.iloc[changed_rows])
 
-        processed_df = preprocess_data(raw_df)
-        
-        rates_df = calculate_approval_rates(processed_df)
         class_metrics_df = aggregate_class_metrics(processed_df)
-        class_metrics_df = class_metrics_df.merge(rates_df, on=GRADE_KEY_COLS, how='left')
+        final_df = enrich_rows(drop_duplicate_rows(processed_df, original_header), class_metrics_df, blocks_map_path)
+        regular_df, irregular_df = separate_regular_and_irregular_classes(final_df)
+
+        for df, columns, kind in ((regular_df, regular_cols, 'regulares'), (irregular_df, irregular_cols, 'irregulares')):
+            final_columns = [col for col in columns if col in df.columns]
+            output_df = format_for_output(df[final_columns])
+            by_semester = output_df.groupby(SEMESTER_COL, sort=False, observed=True).indices
+            for semester in changed:
+                rows = by_semester.get(semester, [])
+                output_df.iloc[rows].to_csv(partition_path(state_dir, semester, kind), index=False, header=False, encoding='utf-8')
+
+    for semester in set(previous_fingerprints) - set(fingerprints):
+        for kind in ('regulares', 'irregulares'):
+            partition_path(state_dir, semester, kind).unlink(missing_ok=True)
+
+    concatenate_partitions(regular_cols, [partition_path(state_dir, s, 'regulares') for s in fingerprints], regular_output_path)
+    concatenate_partitions(irregular_cols, [partition_path(state_dir, s, 'irregulares') for s in fingerprints], irregular_output_path)
+
+    with open(state_dir / INCREMENTAL_MANIFEST, 'w', encoding='utf-8') as file:
+        json.dump({'cabecalho': original_header, 'semestres': fingerprints}, file, ensure_ascii=False, indent=2)
+    logging.info(f"Relatórios remontados em: {regular_output_path} e {irregular_output_path}")
+
+def run_analysis_pipeline(input_path: Union[Path, str, List[Path]], regular_output_path: Path, irregular_output_path: Path, blocks_map_path: Path,
+                          chunksize: Optional[int] = None, columnar_output_path: Optional[Path] = None,
+                          incremental_state_dir: Optional[Path] = None, max_workers: Optional[int] = None,
+                          instrumentation_path: Optional[Path] = None, profile_path: Optional[Path] = None,
+                          class_table_path: Optional[Path] = None, enrollment_table_path: Optional[Path] = None,
+                          unmapped_report_path: Optional[Path] = None, catalog_path: Optional[Path] = None,
+                          sleep_features_path: Optional[Path] = None, database_path: Optional[Path] = None,
+                          trace_memory: bool = False):
+    try:
+        input_paths = resolve_input_paths(input_path)
+        if not input_paths:
+            raise FileNotFoundError(f"Nenhum arquivo encontrado para: '{input_path}'...")
+        input_path = input_paths[0]
 
-        df_with_metrics = merge_classes_metrics(processed_df, class_metrics_df)
-        df_with_derived_metrics = calculate_derived_metrics(df_with_metrics)
-        final_df = add_block_information(df_with_derived_metrics, blocks_map_path)
+        if len(input_paths) > 1 or chunksize or incremental_state_dir:
+            if len(input_paths) > 1:
+                run_multi_course_pipeline(input_paths, regular_output_path, irregular_output_path, blocks_map_path, max_workers)
+            elif chunksize:
+                run_streaming_analysis_pipeline(input_path, regular_output_path, irregular_output_path, blocks_map_path, chunksize)
+            else:
+                run_incremental_analysis_pipeline(input_path, regular_output_path, irregular_output_path, blocks_map_path, incremental_state_dir)
+            if columnar_output_path or instrumentation_path or unmapped_report_path or catalog_path or sleep_features_path or database_path:
+                logging.warning("O artefato colunar, as medidas por etapa, o relatório de disciplinas sem bloco, o catálogo, "
+                                "os indicadores de sono e o banco de dados so sao gerados no modo em memoria.")
+            logging.info("Pipeline de análise concluído com sucesso.")
+            return
 
-        formatted_df = format_data_for_output(final_df)
-        regular_df, irregular_df = separate_regular_and_irregular_classes(formatted_df)
+        stages = [] if instrumentation_path else None
+        stage = partial(run_stage, stages, profile=profile_path is not None, trace_memory=trace_memory)
 
-        base_metrics = ["bloco", "total_alunos_disciplina", "carga_semanal_dias", "media_disciplina", 
-                        "desvio_padrao", "taxa_aprovacao", "taxa_reprovacao"]
+        raw_df = stage('load_data_csv', load_data_csv, input_path)
+        original_header = raw_df.columns.tolist()
+
+        processed_df = stage('preprocess_data', preprocess_data, raw_df)
         
-        regular_cols = original_header + ["turno_predominante", "peso_final"] + base_metrics
-        irregular_cols = original_header + base_metrics
+        class_metrics_df = stage('aggregate_class_metrics', aggregate_class_metrics, processed_df)
+
+        if catalog_path:
+            catalog, legend = stage('build_class_catalog', build_class_catalog, processed_df, class_metrics_df)
+            save_class_catalog(catalog, legend, catalog_path)
+
+        if sleep_features_path:
+            sleep_df = stage('add_sleep_features', add_sleep_features, processed_df, original_header)
+            save_sleep_features(sleep_df, sleep_features_path)
+
+        if class_table_path or database_path:
+            class_table = stage('build_class_table', build_class_table, processed_df, class_metrics_df, blocks_map_path)
+        if database_path:
+            stage('save_database', save_database, class_table, build_enrollment_table(processed_df, original_header), database_path)
+
+        if class_table_path:
+            stage('save_normalized_tables', save_normalized_tables, processed_df, class_table, original_header,
+                  class_table_path, enrollment_table_path or class_table_path.with_name('matriculas.csv'))
+            if unmapped_report_path:
+                save_unmapped_disciplines_report(class_table, unmapped_report_path)
+            if stages is not None:
+                logging.info("Medidas por etapa:\n" + format_stage_report(stages))
+                save_stage_report(stages, instrumentation_path, profile_path)
+            logging.info("Pipeline de análise concluído com sucesso (saída por turma).")
+            return
+
+        output_rows_df = stage('drop_duplicate_rows', drop_duplicate_rows, processed_df, original_header)
+
+        df_with_metrics = stage('merge_classes_metrics', merge_classes_metrics, output_rows_df, class_metrics_df)
+        df_with_derived_metrics = stage('calculate_derived_metrics', calculate_derived_metrics, df_with_metrics)
+        final_df = stage('add_block_information', add_block_information, df_with_derived_metrics, blocks_map_path)
+
+        if unmapped_report_path:
+            save_unmapped_disciplines_report(final_df, unmapped_report_path)
+
+        regular_df, irregular_df = stage('separate_regular_and_irregular_classes', separate_regular_and_irregular_classes, final_df)
+
+        regular_cols, irregular_cols = output_columns(original_header)
+
+        stage('prepare_and_save_csv (regulares)', prepare_and_save_csv, regular_df, regular_cols,regular_output_path, False)
+        stage('prepare_and_save_csv (irregulares)', prepare_and_save_csv, irregular_df, irregular_cols, irregular_output_path, False)
+
+        if columnar_output_path:
+            stage('write_columnar_artifact', write_columnar_artifact, regular_df, regular_cols, columnar_output_path,
+                  hash_input_files(*input_paths, blocks_map_path), regular_output_path)
 
-        prepare_and_save_csv(regular_df, regular_cols,regular_output_path)
-        prepare_and_save_csv(irregular_df, irregular_cols, irregular_output_path)
+        if stages is not None:
+            logging.info("Medidas por etapa:\n" + format_stage_report(stages))
+            save_stage_report(stages, instrumentation_path, profile_path)
 
         logging.info("Pipeline de análise concluído com sucesso.")
     except Exception as e:
@@ -212,15 +1305,25 @@ if __name__ == "__main__":
     out_folder = base_path / 'results'
     out_folder.mkdir(exist_ok=True)
 
-    input_csv_path = input_folder / "data.csv"
+    input_csv_path = sys.argv[1:] or input_folder / "data.csv"
 
     regular_output_path = out_folder / 'materias_regulares.csv'
     irregular_output_path = out_folder /  'materias_irregulares.csv'
+    columnar_output_path = out_folder / 'materias_regulares.parquet'
+    unmapped_report_path = out_folder / 'disciplinas_sem_bloco.csv'
+    catalog_path = out_folder / 'catalogo.txt'
+    sleep_features_path = out_folder / 'matriculas_sono.csv'
+    database_path = out_folder / 'analise.sqlite'
     blocks_map_path = base_path / 'include' / 'disciplinas-bloco.csv'
 
     run_analysis_pipeline(
         input_path=input_csv_path,  
         regular_output_path=regular_output_path,
         irregular_output_path=irregular_output_path,
-        blocks_map_path=blocks_map_path
+        blocks_map_path=blocks_map_path,
+        columnar_output_path=columnar_output_path,
+        unmapped_report_path=unmapped_report_path,
+        catalog_path=catalog_path,
+        sleep_features_path=sleep_features_path,
+        database_path=database_path
     )
\ No newline at end of file
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+BASE_PATH = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_PATH))
+sys.path.append(str(BASE_PATH / 'graphs'))
+sys.path.append(str(BASE_PATH / 'benchmarks'))
+
+import main
+from synthetic_data import generate_enrollment_csv
+
+ENROLLMENT_HEADER = ['Curso', 'Ano/Semestre Ingresso', 'RGA', 'Nome Aluno', 'Sexo', 'Data Nascimento', 'Ano/Semestre Disciplina',
+                     'Disciplina', 'Dia da Semana', 'Horário Início', 'Horário Fim', 'Média Final', '% Frequência', 'Situação Final']
+
+SYNTHETIC_ROWS = 5000
+
+@pytest.fixture(scope='session')
+def synthetic_input(tmp_path_factory) -> Path:
+    """Extrato sintetico com alunos de varios cursos nas mesmas turmas e notas com virgula decimal."""
+    return generate_enrollment_csv(tmp_path_factory.mktemp('sintetico') / 'sintetico.csv', SYNTHETIC_ROWS, seed=0)
+
+@pytest.fixture(scope='session')
+def synthetic_report(synthetic_input) -> Path:
+    """materias_regulares.csv do extrato sintetico, gerado pelo pipeline em memoria."""
+    output_folder = synthetic_input.parent
+    main.run_analysis_pipeline(synthetic_input, output_folder / 'materias_regulares.csv', output_folder / 'materias_irregulares.csv',
+                               BASE_PATH / 'include' / 'disciplinas-bloco.csv')
+    return output_folder / 'materias_regulares.csv'
+
+@pytest.fixture(scope='session')
+def csrc_path() -> Path:
+    return BASE_PATH / 'include' / 'CSRC.csv'
+
+@pytest.fixture(scope='session')
+def blocks_map_path() -> Path:
+    return BASE_PATH / 'include' / 'disciplinas-bloco.csv'
+
+@pytest.fixture
+def write_enrollments(tmp_path):
+    """Grava um extrato no esquema de include/CSRC.csv a partir de dicionarios com as colunas que variam."""
+    def write(rows: list, name: str = 'matriculas.csv') -> Path:
+        defaults = {'Curso': 'CURSO A', 'Ano/Semestre Ingresso': '2010/1', 'Nome Aluno': 'X*** Y****', 'Sexo': 'M',
+                    'Data Nascimento': '01/01/1990', 'Ano/Semestre Disciplina': '2011/2', 'Disciplina': 'CÁLCULO I',
+                    'Dia da Semana': 'Terça-feira', 'Horário Início': '19:00:00', 'Horário Fim': '20:40:00'}
+        path = tmp_path / name
+        pd.DataFrame([{**defaults, **row} for row in rows], columns=ENROLLMENT_HEADER).to_csv(path, index=False, encoding='utf-8')
+        return path
+    return write
+
+@pytest.fixture(scope='session')
+def synthetic_processed(synthetic_input) -> pd.DataFrame:
+    """Linhas do extrato sintetico depois de preprocess_data."""
+    return main.preprocess_data(main.load_data_csv(synthetic_input))
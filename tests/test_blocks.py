@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+import main
+
+def write_blocks_map(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+def test_normalize_discipline_name_ignores_case_accents_and_spaces():
+    assert main.normalize_discipline_name('  Cálculo   I ') == 'calculo i'
+    assert main.normalize_discipline_name('INTERAÇÃO\tHUMANO-COMPUTADOR') == 'interacao humano-computador'
+
+def test_lookup_blocks_matches_names_written_differently(tmp_path):
+    blocks_map_path = write_blocks_map(tmp_path / 'blocos.csv', ['CÁLCULO I, EXATAS', 'BANCO DE DADOS II, FACOM'])
+    index = main.build_block_index(blocks_map_path)
+
+    disciplines = pd.Series(['calculo  i', 'Cálculo I', 'Banco de Dados II', 'QUÍMICA', None])
+    expected = ['EXATAS', 'EXATAS', 'FACOM', main.UNMAPPED_BLOCK, main.UNMAPPED_BLOCK]
+    assert list(main.lookup_blocks(disciplines, index)) == expected
+    assert list(main.lookup_blocks(disciplines.astype('category'), index)) == expected
+
+def test_build_block_index_keeps_first_block_of_conflicting_names(tmp_path):
+    blocks_map_path = write_blocks_map(tmp_path / 'blocos.csv', ['CÁLCULO I, EXATAS', 'Calculo I, FACOM'])
+    assert main.build_block_index(blocks_map_path) == {'calculo i': 'EXATAS'}
+
+def test_load_block_index_rebuilds_cache_when_map_changes(tmp_path):
+    blocks_map_path = write_blocks_map(tmp_path / 'blocos.csv', ['CÁLCULO I, EXATAS'])
+    assert main.load_block_index(blocks_map_path) == {'calculo i': 'EXATAS'}
+    assert main.block_index_cache_path(blocks_map_path).exists()
+
+    write_blocks_map(blocks_map_path, ['CÁLCULO I, FACOM', 'FÍSICA I, EXATAS'])
+    stat = blocks_map_path.stat()
+    os.utime(blocks_map_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert main.load_block_index(blocks_map_path) == {'calculo i': 'FACOM', 'fisica i': 'EXATAS'}
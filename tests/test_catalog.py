@@ -0,0 +1,68 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from conftest import BASE_PATH
+
+LEGACY_CATALOG_PATH = BASE_PATH / 'trash' / 'catalogo.txt'
+
+def decimal_places(values: pd.Series) -> set:
+    """Casas decimais usadas em uma coluna do catalogo gravado, ignorando 'NaN'."""
+    return {len(value.partition('.')[2]) for value in values if value != 'NaN'}
+
+@pytest.fixture
+def catalog_from(tmp_path, blocks_map_path):
+    def build(input_path):
+        processed_df = main.preprocess_data(main.load_data_csv(input_path))
+        class_metrics_df = main.aggregate_class_metrics(processed_df)
+        return processed_df, class_metrics_df, main.build_class_catalog(processed_df, class_metrics_df)
+    return build
+
+def test_catalog_matches_legacy_layout(tmp_path, csrc_path, catalog_from):
+    _, _, (catalog, legend) = catalog_from(csrc_path)
+    catalog_path = tmp_path / 'catalogo.txt'
+    main.save_class_catalog(catalog, legend, catalog_path)
+
+    legacy = LEGACY_CATALOG_PATH.read_text(encoding='utf-8').splitlines()
+    saved = catalog_path.read_text(encoding='utf-8').splitlines()
+    assert saved[0].split('\t') == legacy[0].split()
+
+    legacy_df = pd.DataFrame([line.split('\t') for line in legacy[1:]], columns=main.CATALOG_COLS)
+    saved_df = pd.read_csv(catalog_path, sep='\t', dtype=str, keep_default_na=False)
+    for col in main.CATALOG_COLS:
+        assert decimal_places(saved_df[col]) == decimal_places(legacy_df[col]), col
+    assert all(re.fullmatch(r'\d+', value) for value in saved_df['turma'])
+    assert (legend.columns == ['coluna', 'codigo', 'valor']).all()
+
+def test_catalog_outcomes_and_absences(write_enrollments, catalog_from):
+    input_path = write_enrollments([
+        {'RGA': '1', 'Média Final': '8.0', '% Frequência': '100.00', 'Situação Final': 'AP'},
+        {'RGA': '2', 'Média Final': '4,0', '% Frequência': '90.00', 'Situação Final': 'RN'},
+        {'RGA': '3', 'Média Final': '2.0', '% Frequência': '60.00', 'Situação Final': 'RF'},
+        {'RGA': '4', 'Média Final': '3.0', '% Frequência': '10.00', 'Situação Final': 'RF'},
+    ])
+    _, _, (catalog, _) = catalog_from(input_path)
+    row = catalog.iloc[0]
+
+    assert row['num.t'] == 4
+    assert (row['num.a'], row['num.r'], row['num.d']) == (0.25, 0.5, 0.25)
+    # Desistente com nota: a media dos desistentes nao e fixada em zero
+    assert row['media.d'] == pytest.approx(3.0)
+    assert row['media.r'] == pytest.approx(3.0)
+    # media.freq.* e o percentual de faltas
+    assert row['media.freq.a'] == pytest.approx(0.0)
+    assert row['media.freq.r'] == pytest.approx((10.0 + 40.0) / 2)
+    assert row['media.freq.d'] == pytest.approx(90.0)
+    assert row['media.freq.t'] == pytest.approx((0.0 + 10.0 + 40.0 + 90.0) / 4)
+
+def test_catalog_turma_legend_gives_class_id(csrc_path, blocks_map_path, catalog_from):
+    processed_df, class_metrics_df, (catalog, legend) = catalog_from(csrc_path)
+    class_table = main.build_class_table(processed_df, class_metrics_df, blocks_map_path)
+
+    assert catalog['turma'].is_unique
+    assert sorted(catalog['turma']) == list(range(1, len(catalog) + 1))
+    class_ids = legend[legend['coluna'] == 'turma'].set_index('codigo')['valor']
+    assert np.array_equal(class_ids.loc[catalog['turma']].to_numpy(dtype=np.int64), class_table[main.CLASS_ID_COL].to_numpy())
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import main
+
+def expected_class_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """As metricas por turma com groupby comuns, uma coluna por vez."""
+    classes = df.groupby(main.GRADE_KEY_COLS, observed=True)
+    student_means = df.groupby(main.GRADE_KEY_COLS + ['RGA'], observed=True)['Media-Final-Float'].mean()
+    student_grades = student_means.groupby(level=main.GRADE_KEY_COLS, observed=True)
+    first_day_rows = df.drop_duplicates(subset=main.GRADE_KEY_COLS + ['Dia da Semana'])
+
+    return pd.DataFrame({
+        'total_alunos_disciplina': classes['RGA'].nunique(),
+        'carga_semanal_dias': classes['Dia da Semana'].nunique(),
+        'turnos_distintos': classes['Turno'].agg(frozenset),
+        'media_disciplina': student_grades.mean(),
+        'desvio_padrao': student_grades.std(),
+        'soma_pesos_horario': first_day_rows.groupby(main.GRADE_KEY_COLS, observed=True)['Peso-Horario'].sum(),
+        'taxa_aprovacao': classes[main.FINAL_SITUATION_COL].agg(lambda status: (status == main.APPROVED_STATUS).mean()),
+    })
+
+def test_class_metrics_match_groupby(synthetic_processed):
+    class_metrics = main.aggregate_class_metrics(synthetic_processed).set_index(main.GRADE_KEY_COLS)
+    expected = expected_class_metrics(synthetic_processed)
+
+    assert class_metrics.index.equals(expected.index)
+    for col in ['total_alunos_disciplina', 'carga_semanal_dias', 'soma_pesos_horario']:
+        assert np.array_equal(class_metrics[col].to_numpy(), expected[col].to_numpy()), col
+    assert class_metrics['turnos_distintos'].tolist() == expected['turnos_distintos'].tolist()
+    for col in ['media_disciplina', 'desvio_padrao', 'taxa_aprovacao']:
+        np.testing.assert_allclose(class_metrics[col], expected[col], rtol=1e-12, atol=1e-12, equal_nan=True, err_msg=col)
+    np.testing.assert_allclose(class_metrics['taxa_reprovacao'], 1 - expected['taxa_aprovacao'], rtol=1e-12)
@@ -0,0 +1,23 @@
+import main
+from conftest import ENROLLMENT_HEADER
+
+def test_enrollment_table_rebuilds_rows_through_class_table(synthetic_processed, blocks_map_path):
+    class_metrics_df = main.aggregate_class_metrics(synthetic_processed)
+    class_table = main.build_class_table(synthetic_processed, class_metrics_df, blocks_map_path).set_index(main.CLASS_ID_COL)
+    enrollments_df = main.build_enrollment_table(synthetic_processed, ENROLLMENT_HEADER)
+
+    assert class_table.index.is_unique
+    assert not set(main.CLASS_TABLE_HELD_COLS) & set(enrollments_df.columns)
+    assert enrollments_df[main.CLASS_ID_COL].isin(class_table.index).all()
+
+    # Cada linha original volta pela turma: disciplina, semestre e o encontro em 'horarios'
+    rows = synthetic_processed.assign(**{main.CLASS_ID_COL: main.hash_rows(synthetic_processed, main.GRADE_KEY_COLS)})
+    classes = class_table.loc[rows[main.CLASS_ID_COL]]
+    assert (classes['Disciplina'].to_numpy() == rows['Disciplina'].to_numpy()).all()
+    assert (classes['Ano/Semestre Disciplina'].to_numpy() == rows['Ano/Semestre Disciplina'].to_numpy()).all()
+    slots = rows['Dia da Semana'].astype(str) + ' ' + rows['Horário Início'].astype(str) + '-' + rows['Horário Fim'].astype(str)
+    assert all(slot in schedule.split('; ') for slot, schedule in zip(slots, classes[main.CLASS_SCHEDULE_COL]))
+
+    student_cols = [col for col in ENROLLMENT_HEADER if col not in main.CLASS_TABLE_HELD_COLS]
+    expected = rows[student_cols + [main.CLASS_ID_COL]].drop_duplicates()
+    assert len(enrollments_df) == len(expected)
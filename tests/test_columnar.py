@@ -0,0 +1,19 @@
+import columnar
+import main
+
+def test_columnar_artifact_is_used_only_for_its_own_report(tmp_path, csrc_path, blocks_map_path):
+    report_path = tmp_path / 'materias_regulares.csv'
+    columnar_path = report_path.with_suffix('.parquet')
+    main.run_analysis_pipeline(csrc_path, report_path, tmp_path / 'materias_irregulares.csv', blocks_map_path,
+                               columnar_output_path=columnar_path)
+
+    attrs = columnar.columnar_attrs(columnar_path)
+    assert attrs[columnar.INPUT_HASH_KEY] == columnar.hash_input_files(csrc_path, blocks_map_path)
+    assert attrs[columnar.REPORT_HASH_KEY] == columnar.hash_input_files(report_path)
+    columnar_df = columnar.load_columnar_if_fresh(report_path)
+    assert columnar_df is not None and len(columnar_df) == len(report_path.read_text(encoding='utf-8').splitlines()) - 1
+
+    # Um relatorio regravado por outra execucao (ou editado) deixa o artefato para tras, mesmo com mtime mais antigo
+    report_path.write_text(report_path.read_text(encoding='utf-8').replace(',AP,', ',RN,', 1), encoding='utf-8')
+    columnar_path.touch()
+    assert columnar.load_columnar_if_fresh(report_path) is None
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from render_figures import correlation
+
+@pytest.fixture(scope='module')
+def report_df(synthetic_report) -> pd.DataFrame:
+    return pd.read_csv(synthetic_report)
+
+@pytest.mark.parametrize('min_students', [1, 5, 20, 40])
+@pytest.mark.parametrize('max_weekly_classes', [1, 2, 3])
+def test_correlation_from_statistics_matches_filtered_rows(report_df, min_students, max_weekly_classes):
+    stats = correlation.compute_correlation_statistics(report_df)
+    corr_matrix = correlation.correlation_from_statistics(stats, min_students, max_weekly_classes)
+
+    filtered_df = correlation.filter_data(report_df, min_students, max_weekly_classes)
+    expected = correlation.prepare_data_for_correlation(filtered_df, correlation.NUMERIC_COLS_TO_CONVERT,
+                                                        correlation.CATEGORICAL_COLS_TO_CONVERT).corr()
+    assert sorted(corr_matrix.columns) == sorted(expected.columns)
+    expected = expected.loc[corr_matrix.index, corr_matrix.columns]
+    np.testing.assert_allclose(corr_matrix.to_numpy(), expected.to_numpy(), atol=1e-9, equal_nan=True)
+
+def test_correlation_statistics_survive_the_cache(report_df, tmp_path):
+    stats = correlation.compute_correlation_statistics(report_df)
+    cache_path = tmp_path / 'correlacao.npz'
+    correlation.save_correlation_statistics(stats, cache_path, 'assinatura')
+
+    assert correlation.load_cached_correlation_statistics(cache_path, 'outra assinatura') is None
+    cached = correlation.load_cached_correlation_statistics(cache_path, 'assinatura')
+    pd.testing.assert_frame_equal(correlation.correlation_from_statistics(cached, 5, 3),
+                                  correlation.correlation_from_statistics(stats, 5, 3))
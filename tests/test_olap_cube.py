@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import graphs_analysis as comparative
+import olap_cube
+
+SEMESTER_COL = olap_cube.SEMESTER_COL
+
+def assert_same_aggregates(rollup_df: pd.DataFrame, expected_df: pd.DataFrame):
+    pd.testing.assert_frame_equal(rollup_df[expected_df.columns].reset_index(drop=True), expected_df.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
+
+@pytest.fixture(scope='module')
+def base_filtered_df(synthetic_report) -> pd.DataFrame:
+    return comparative.apply_filters_and_cleaning(pd.read_csv(synthetic_report), comparative.MIN_STUDENTS_FILTER,
+                                                  comparative.MAX_WEEKLY_CLASSES_FILTER)
+
+@pytest.fixture(scope='module')
+def cube(base_filtered_df):
+    return olap_cube.build_cube(base_filtered_df, comparative.MIN_STUDENTS_FILTER, comparative.MAX_WEEKLY_CLASSES_FILTER)
+
+@pytest.mark.parametrize('group_by_cols', [[SEMESTER_COL, 'turno_predominante'], [SEMESTER_COL, 'bloco'],
+                                           [SEMESTER_COL, 'bloco', 'turno_predominante'], [SEMESTER_COL, 'carga_semanal_dias']])
+def test_rollup_matches_aggregate_data(cube, base_filtered_df, group_by_cols):
+    assert_same_aggregates(olap_cube.roll_up(cube, group_by_cols), comparative.aggregate_data(base_filtered_df, group_by_cols))
+
+def test_course_rollup_counts_each_course_of_a_class(cube, base_filtered_df):
+    classes = base_filtered_df.drop_duplicates(olap_cube.UNIQUE_CLASS_COLS + ['Curso'])
+    # O extrato sintetico tem turmas com alunos de mais de um curso, que 'Curso' da primeira linha esconderia
+    assert (classes.groupby(olap_cube.UNIQUE_CLASS_COLS)['Curso'].nunique() > 1).any()
+
+    for course in base_filtered_df['Curso'].unique():
+        course_df = base_filtered_df[base_filtered_df['Curso'] == course]
+        rollup_df = olap_cube.roll_up(cube, [SEMESTER_COL, 'turno_predominante'], {'Curso': [course]})
+        assert_same_aggregates(rollup_df, comparative.aggregate_data(course_df, [SEMESTER_COL, 'turno_predominante']))
+
+        by_course = olap_cube.roll_up(cube, [SEMESTER_COL, 'Curso']).query('Curso == @course').drop(columns='Curso')
+        expected = comparative.aggregate_data(course_df, [SEMESTER_COL, 'Curso']).drop(columns='Curso')
+        assert_same_aggregates(by_course, expected)
+
+def test_cube_cache_round_trip(cube, tmp_path):
+    cache_path = tmp_path / '.materias_regulares.cubo.npz'
+    olap_cube.save_cube(cube, cache_path, 'assinatura')
+    assert olap_cube.load_cached_cube(cache_path, 'outra') is None
+
+    cached = olap_cube.load_cached_cube(cache_path, 'assinatura')
+    for group_by_cols in ([SEMESTER_COL, 'bloco'], ['Curso', 'turno_predominante']):
+        pd.testing.assert_frame_equal(olap_cube.roll_up(cached, group_by_cols), olap_cube.roll_up(cube, group_by_cols))
@@ -0,0 +1,32 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+@pytest.mark.parametrize('kind, values, expected', [
+    ('hora', ['19:00:00', '0:00:00', '07:30:15', '25:00:00', None], [19 * 3600, 0, 7 * 3600 + 30 * 60 + 15, np.nan, np.nan]),
+    ('data', ['01/01/1990', '29/02/2000', '31/02/2000', None], [date(1990, 1, 1).toordinal(), date(2000, 2, 29).toordinal(), np.nan, np.nan]),
+    ('semestre', ['2011/1', '2011/2', '2012/1', '2011', None], [4022, 4023, 4024, np.nan, np.nan]),
+    ('decimal', ['8,5', '7.25', '10', 'SN', None], [8.5, 7.25, 10.0, np.nan, np.nan]),
+    ('dia', ['Segunda-feira', 'Terça-feira', 'SÁBADO', 'Domingo', 'feriado', None], [0, 1, 5, 6, np.nan, np.nan]),
+])
+def test_parse_column_converts_each_kind(kind, values, expected):
+    np.testing.assert_array_equal(main.parse_column(pd.Series(values, dtype=object), kind), np.array(expected, dtype=float))
+
+def test_parse_column_broadcasts_distinct_values(monkeypatch):
+    calls = []
+    def parse(value):
+        calls.append(value)
+        return float(len(value))
+    monkeypatch.setitem(main.PARSERS, 'teste', parse)
+    monkeypatch.setitem(main._parsed_values, 'teste', {})
+
+    values = pd.Series(['a', 'bb', 'a', None, 'bb', 'a'])
+    np.testing.assert_array_equal(main.parse_column(values, 'teste'), [1, 2, 1, np.nan, 2, 1])
+    # Categorias e arquivos seguintes reaproveitam o que ja foi convertido
+    np.testing.assert_array_equal(main.parse_column(values.astype('category'), 'teste'), [1, 2, 1, np.nan, 2, 1])
+    np.testing.assert_array_equal(main.parse_column(pd.Series(['ccc', 'a']), 'teste'), [3, 1])
+    assert calls == ['a', 'bb', 'ccc']
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+import main
+
+def report_lines(path) -> list:
+    lines = path.read_text(encoding='utf-8').splitlines()
+    return [lines[0]] + sorted(lines[1:])
+
+def split_input(input_path, output_folder, parts: int) -> list:
+    """Divide o extrato em 'parts' arquivos de linhas consecutivas, como os arquivos de cada curso."""
+    raw_df = pd.read_csv(input_path, dtype=str, keep_default_na=False)
+    paths = []
+    for i in range(parts):
+        path = output_folder / f"parte{i}.csv"
+        raw_df.iloc[i * len(raw_df) // parts:(i + 1) * len(raw_df) // parts].to_csv(path, index=False, encoding='utf-8')
+        paths.append(path)
+    return paths
+
+def run_and_compare(synthetic_report, blocks_map_path, tmp_path, **options):
+    """Roda o pipeline com 'options' e compara as linhas dos relatorios com as de 'synthetic_report' (modo em memoria)."""
+    regular_path, irregular_path = tmp_path / 'materias_regulares.csv', tmp_path / 'materias_irregulares.csv'
+    main.run_analysis_pipeline(regular_output_path=regular_path, irregular_output_path=irregular_path,
+                               blocks_map_path=blocks_map_path, **options)
+
+    assert report_lines(regular_path) == report_lines(synthetic_report)
+    assert report_lines(irregular_path) == report_lines(synthetic_report.with_name('materias_irregulares.csv'))
+
+@pytest.mark.parametrize('chunksize', [700, 100_000])
+def test_streaming_reports_match_in_memory(chunksize, synthetic_input, synthetic_report, blocks_map_path, tmp_path):
+    run_and_compare(synthetic_report, blocks_map_path, tmp_path, input_path=synthetic_input, chunksize=chunksize)
+
+def test_incremental_reports_match_in_memory(synthetic_input, synthetic_report, blocks_map_path, tmp_path):
+    # A segunda execucao reaproveita as particoes gravadas na primeira
+    for _ in range(2):
+        run_and_compare(synthetic_report, blocks_map_path, tmp_path, input_path=synthetic_input, incremental_state_dir=tmp_path / 'estado')
+
+def test_incremental_rebuilds_partitions_of_another_report_version(synthetic_input, synthetic_report, blocks_map_path, tmp_path, monkeypatch):
+    state_dir = tmp_path / 'estado'
+    run_and_compare(synthetic_report, blocks_map_path, tmp_path, input_path=synthetic_input, incremental_state_dir=state_dir)
+    partition = next(state_dir.glob('*.regulares.csv'))
+    partition.write_text('linha de uma versao anterior\n', encoding='utf-8')
+
+    monkeypatch.setattr(main, 'REPORT_FORMAT_VERSION', main.REPORT_FORMAT_VERSION + 1)
+    run_and_compare(synthetic_report, blocks_map_path, tmp_path, input_path=synthetic_input, incremental_state_dir=state_dir)
+
+def test_multi_file_reports_match_in_memory(synthetic_input, blocks_map_path, tmp_path):
+    input_paths = split_input(synthetic_input, tmp_path, 3)
+    # Linhas repetidas em outro arquivo aparecem uma vez so nos relatorios, como em um arquivo unico
+    parts = [pd.read_csv(path, dtype=str, keep_default_na=False) for path in input_paths]
+    parts[2] = pd.concat([parts[2], parts[0].head(5)])
+    parts[2].to_csv(input_paths[2], index=False, encoding='utf-8')
+
+    single_path = tmp_path / 'unico' / 'unico.csv'
+    single_path.parent.mkdir()
+    pd.concat(parts).to_csv(single_path, index=False, encoding='utf-8')
+    main.run_analysis_pipeline(single_path, single_path.with_name('materias_regulares.csv'),
+                               single_path.with_name('materias_irregulares.csv'), blocks_map_path)
+
+    run_and_compare(single_path.with_name('materias_regulares.csv'), blocks_map_path, tmp_path, input_path=input_paths, max_workers=2)
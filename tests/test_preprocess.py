@@ -0,0 +1,37 @@
+import numpy as np
+
+import main
+
+def test_classify_start_times_matches_interval_rule():
+    seconds = np.arange(24 * 3600)
+    is_valid, shifts, weights = main.classify_start_times(seconds, main.SHIFTS, main.TIME_WEIGHT)
+
+    # A regra original, linha a linha: primeiro intervalo (com fim inclusivo) que contem o horario
+    expected_shifts = [main.first_matching_interval(second, main.SHIFTS) or main.SHIFT_UNDEFINED for second in seconds]
+    expected_weights = [main.first_matching_interval(second, main.TIME_WEIGHT) for second in seconds]
+
+    assert is_valid.tolist() == [weight is not None for weight in expected_weights]
+    assert shifts.tolist() == expected_shifts
+    assert weights[is_valid].tolist() == [weight for weight in expected_weights if weight is not None]
+
+def test_schedule_fingerprint_ignores_row_order(synthetic_input):
+    rows = main.preprocess_rows(main.load_data_csv(synthetic_input))
+    shuffled = rows.sample(frac=1, random_state=0)
+
+    fingerprint = main.compute_schedule_fingerprint(rows)
+    assert fingerprint.equals(main.compute_schedule_fingerprint(shuffled).reindex(rows.index))
+
+    # Todas as linhas de uma matricula tem o mesmo fingerprint, e horarios diferentes dao fingerprints diferentes
+    enrollments = rows.assign(fingerprint=fingerprint).groupby(main.KEY_COLS, observed=True)
+    assert (enrollments['fingerprint'].nunique() == 1).all()
+    slots = enrollments.apply(lambda df: frozenset(zip(df['Dia da Semana'], df['Horário Início'])), include_groups=False)
+    assert slots.groupby(enrollments['fingerprint'].first()).nunique().max() == 1
+
+def test_describe_schedules_recovers_the_slots(synthetic_input):
+    rows = main.preprocess_data(main.load_data_csv(synthetic_input))
+    schedules = main.describe_schedules(rows)
+
+    assert schedules.index.is_unique and set(schedules.index) == set(rows['grade_horarios_aluno'])
+    for fingerprint, enrollment in rows.groupby(main.KEY_COLS + ['grade_horarios_aluno'], observed=True).groups.items():
+        slots = set(zip(rows.loc[enrollment, 'Dia da Semana'], rows.loc[enrollment, 'Horário Início']))
+        assert set(schedules[fingerprint[-1]]) == slots
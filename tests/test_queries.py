@@ -0,0 +1,61 @@
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+import graphs_analysis as comparative
+import main
+import queries
+
+SEMESTER_COL = queries.SEMESTER_COL
+
+@pytest.fixture(scope='module')
+def database_path(synthetic_input, blocks_map_path, tmp_path_factory):
+    database_path = tmp_path_factory.mktemp('banco') / 'analise.sqlite'
+    main.run_analysis_pipeline(synthetic_input, database_path.with_name('materias_regulares.csv'),
+                               database_path.with_name('materias_irregulares.csv'), blocks_map_path, database_path=database_path)
+    return database_path
+
+@pytest.fixture(scope='module')
+def base_filtered_df(database_path) -> pd.DataFrame:
+    """As turmas regulares do banco, filtradas como graphs_analysis faz com a tabela por turma."""
+    with closing(queries.connect(database_path)) as connection:
+        classes_df = queries.query(connection, 'SELECT * FROM turmas')
+    classes_df = classes_df[classes_df['turma_regular'] == 1]
+    return comparative.apply_filters_and_cleaning(classes_df, comparative.MIN_STUDENTS_FILTER, comparative.MAX_WEEKLY_CLASSES_FILTER)
+
+def sorted_by(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    return df.sort_values(cols).reset_index(drop=True)
+
+@pytest.mark.parametrize('group_by_cols', [[SEMESTER_COL, 'turno_predominante'], [SEMESTER_COL, 'bloco'],
+                                           [SEMESTER_COL, 'bloco', 'turno_predominante']])
+def test_sql_aggregates_match_graphs_analysis(database_path, base_filtered_df, group_by_cols):
+    with closing(queries.connect(database_path)) as connection:
+        sql_df = queries.aggregate_data(connection, group_by_cols)
+    expected = comparative.aggregate_data(base_filtered_df, group_by_cols)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(sorted_by(sql_df[expected.columns], group_by_cols), sorted_by(expected, group_by_cols),
+                                  check_dtype=False)
+
+def test_sql_aggregates_match_report(database_path, synthetic_report):
+    # O relatorio grava as medias com duas casas, entao a media das medias difere no maximo pelo arredondamento
+    report_df = comparative.apply_filters_and_cleaning(pd.read_csv(synthetic_report), comparative.MIN_STUDENTS_FILTER,
+                                                       comparative.MAX_WEEKLY_CLASSES_FILTER)
+    group_by_cols = [SEMESTER_COL, 'turno_predominante']
+    with closing(queries.connect(database_path)) as connection:
+        sql_df = queries.aggregate_data(connection, group_by_cols)
+    expected = comparative.aggregate_data(report_df, group_by_cols)
+
+    pd.testing.assert_frame_equal(sorted_by(sql_df[expected.columns], group_by_cols), sorted_by(expected, group_by_cols),
+                                  check_dtype=False, check_exact=False, atol=0.01)
+
+def test_sql_filters_match_pandas(database_path, base_filtered_df):
+    semester = base_filtered_df[SEMESTER_COL].min()
+    with closing(queries.connect(database_path)) as connection:
+        sql_df = queries.aggregate_data(connection, [SEMESTER_COL, 'bloco'], filters={'turno_predominante': 'NOITE'}, until=semester)
+    night_df = base_filtered_df[(base_filtered_df['turno_predominante'] == 'NOITE') & (base_filtered_df[SEMESTER_COL] <= semester)]
+    expected = comparative.aggregate_data(night_df, [SEMESTER_COL, 'bloco'])
+
+    pd.testing.assert_frame_equal(sorted_by(sql_df[expected.columns], [SEMESTER_COL, 'bloco']),
+                                  sorted_by(expected, [SEMESTER_COL, 'bloco']), check_dtype=False)
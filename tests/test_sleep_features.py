@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from conftest import ENROLLMENT_HEADER
+
+def meeting(rga: str, discipline: str, day: str, start: str, end: str) -> dict:
+    return {'RGA': rga, 'Disciplina': discipline, 'Dia da Semana': day, 'Horário Início': start, 'Horário Fim': end,
+            'Média Final': '7.0', '% Frequência': '90.00', 'Situação Final': 'AP'}
+
+@pytest.fixture
+def processed_df(write_enrollments) -> pd.DataFrame:
+    input_path = write_enrollments([
+        # Aluno 1: aulas sobrepostas na segunda a noite, terca cedo, quinta a tarde e domingo de manha
+        meeting('1', 'A', 'Segunda-feira', '19:00:00', '22:40:00'),
+        meeting('1', 'B', 'Segunda-feira', '20:30:00', '21:30:00'),
+        meeting('1', 'C', 'Terça-feira', '07:30:00', '09:10:00'),
+        meeting('1', 'D', 'Quinta-feira', '13:00:00', '14:40:00'),
+        meeting('1', 'A', 'Domingo', '08:00:00', '10:00:00'),
+        # Aluno 2: nenhum par de dias seguidos
+        meeting('2', 'A', 'Segunda-feira', '19:00:00', '22:40:00'),
+        meeting('2', 'D', 'Quarta-feira', '13:00:00', '14:40:00'),
+    ])
+    return main.preprocess_data(main.load_data_csv(input_path))
+
+def test_timetable_merges_overlaps_and_finds_next_day(processed_df):
+    timetable = main.build_weekly_timetables(processed_df)
+    student = timetable[timetable['RGA'] == 1].set_index('dia')
+
+    assert student.index.tolist() == [0, 1, 3, 6]
+    assert student.loc[0, 'horas_aula'] == pytest.approx(3 + 40 / 60)
+    assert student.loc[0, 'intervalo_noturno'] == pytest.approx(24 - (22 + 40 / 60) + 7.5)
+    assert bool(student.loc[0, 'noite_manha'])
+    # Domingo volta para segunda
+    assert student.loc[6, 'intervalo_noturno'] == pytest.approx(24 - 10 + 19)
+    assert np.isnan(student.loc[1, 'intervalo_noturno']) and np.isnan(student.loc[3, 'intervalo_noturno'])
+
+def test_sleep_window_features_per_student(processed_df):
+    features = main.sleep_window_features(main.build_weekly_timetables(processed_df)).set_index('RGA')
+
+    first = features.loc[1]
+    assert first['dias_com_aula'] == 4
+    assert first['fim_mais_tarde'] == pytest.approx(22 + 40 / 60)
+    assert first['inicio_mais_cedo'] == pytest.approx(7.5)
+    assert first['menor_intervalo_noturno'] == pytest.approx(24 - (22 + 40 / 60) + 7.5)
+    assert first['intervalo_noturno_medio'] == pytest.approx((24 - (22 + 40 / 60) + 7.5 + 33) / 2)
+    assert first['transicoes_noite_manha'] == 1
+    assert first['horas_aula_dia_max'] == pytest.approx(3 + 40 / 60)
+    assert first['horas_aula_dia_media'] == pytest.approx((3 + 40 / 60 + 1 + 40 / 60 + 1 + 40 / 60 + 2) / 4)
+
+    second = features.loc[2]
+    assert second['dias_com_aula'] == 2 and second['transicoes_noite_manha'] == 0
+    assert np.isnan(second['menor_intervalo_noturno']) and np.isnan(second['intervalo_noturno_medio'])
+
+def test_add_sleep_features_has_one_row_per_enrollment(synthetic_processed):
+    enrollments_df = main.add_sleep_features(synthetic_processed, ENROLLMENT_HEADER)
+
+    assert len(enrollments_df) == synthetic_processed[main.KEY_COLS].drop_duplicates().shape[0]
+    assert not enrollments_df.duplicated(subset=main.KEY_COLS).any()
+    assert enrollments_df['dias_com_aula'].notna().all()
+    # Todas as matriculas de um aluno no semestre recebem os mesmos indicadores
+    per_term = enrollments_df.groupby(main.STUDENT_TERM_COLS)[main.SLEEP_FEATURE_COLS].nunique(dropna=False)
+    assert (per_term <= 1).all().all()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import threshold_sweep
+from render_figures import comparative, correlation
+
+MIN_STUDENTS_VALUES = [1, 5, 20, 40]
+MAX_WEEKLY_CLASSES_VALUES = [1, 2, 3]
+
+@pytest.fixture(scope='module')
+def report_df(synthetic_report) -> pd.DataFrame:
+    return pd.read_csv(synthetic_report)
+
+@pytest.fixture(scope='module')
+def base_df(report_df) -> pd.DataFrame:
+    return comparative.apply_filters_and_cleaning(report_df.copy(), float('-inf'), float('inf')).reset_index(drop=True)
+
+def test_parse_thresholds_expands_ranges():
+    assert threshold_sweep.parse_thresholds(['5', '1:3', '10:20:5', '3']) == [1, 2, 3, 5, 10, 15, 20]
+
+def test_select_rows_matches_filters(base_df):
+    index = threshold_sweep.build_threshold_index(base_df)
+    for min_students in MIN_STUDENTS_VALUES:
+        for max_weekly_classes in MAX_WEEKLY_CLASSES_VALUES:
+            expected = comparative.apply_filters_and_cleaning(base_df.copy(), min_students, max_weekly_classes).index
+            assert threshold_sweep.select_rows(index, min_students, max_weekly_classes).tolist() == expected.tolist()
+
+def test_sweep_matches_one_run_per_combination(report_df, base_df, tmp_path):
+    correlation_stats = correlation.compute_correlation_statistics(report_df)
+    threshold_sweep.sweep_thresholds(base_df, correlation_stats, MIN_STUDENTS_VALUES, MAX_WEEKLY_CLASSES_VALUES, tmp_path, max_workers=1)
+    summary_df = pd.read_csv(tmp_path / threshold_sweep.SWEEP_SUMMARY_FILE)
+    shifts_df = pd.read_csv(tmp_path / threshold_sweep.SWEEP_SHIFTS_FILE)
+
+    assert len(summary_df) == len(MIN_STUDENTS_VALUES) * len(MAX_WEEKLY_CLASSES_VALUES)
+    for summary in summary_df.to_dict('records'):
+        min_students, max_weekly_classes = summary['min_alunos'], summary['max_dias_semana']
+        filtered_df = comparative.apply_filters_and_cleaning(report_df.copy(), min_students, max_weekly_classes)
+        unique_classes_df = filtered_df.drop_duplicates(subset=['Ano/Semestre Disciplina', 'Disciplina', 'turno_predominante', 'bloco'])
+        assert summary['linhas'] == len(filtered_df)
+        assert summary['turmas'] == len(unique_classes_df)
+        assert summary['media_das_medias'] == pytest.approx(unique_classes_df['media_disciplina'].mean())
+
+        corr_matrix = correlation.correlation_from_statistics(correlation_stats, min_students, max_weekly_classes)
+        assert summary['corr_media_taxa_aprovacao'] == pytest.approx(corr_matrix.loc['media_disciplina', 'taxa_aprovacao'])
+
+        expected_shifts = comparative.aggregate_data(filtered_df, ['Ano/Semestre Disciplina', 'turno_predominante'])
+        swept_shifts = shifts_df[(shifts_df['min_alunos'] == min_students) & (shifts_df['max_dias_semana'] == max_weekly_classes)]
+        np.testing.assert_allclose(swept_shifts['media_das_medias'].to_numpy(), expected_shifts['media_das_medias'].to_numpy())